@@ -3,32 +3,75 @@ default_app_config = "herald.apps.HeraldConfig"
 
 class NotificationRegistry(object):
     """
-    Stores the notification classes that get registered.
+    Stores the notification classes that get registered, indexed by their class path.
     """
 
     def __init__(self):
-        self._registry = []
+        self._registry = {}
 
     def register(self, kls):
         """
-        Register a notification class
+        Register a notification class.
+        The dotted path to a class can be given instead, then its module is only imported once the class is needed.
         """
 
-        from .base import NotificationBase
+        if isinstance(kls, str):
+            self._registry.setdefault(kls, kls)
+            return kls
 
-        if not issubclass(kls, NotificationBase):
-            raise ValueError("Notification must subclass NotificationBase.")
+        self._check(kls)
 
-        self._registry.append(kls)
+        self._registry[kls.get_class_path()] = kls
 
         return kls
 
     def unregister(self, kls):
         """
-        Unregister a notification class
+        Unregister a notification class, or the dotted path it was registered with
+        """
+
+        if isinstance(kls, str):
+            class_path = kls
+            registered = class_path in self._registry
+        else:
+            class_path = kls.get_class_path()
+            registered = self._registry.get(class_path) in (kls, class_path)
+
+        if not registered:
+            raise ValueError("{} is not registered.".format(class_path))
+
+        del self._registry[class_path]
+
+    def get(self, class_path):
+        """
+        Returns the registered notification class for the class path, or None.
+        Classes registered by their path are imported on the first call.
+        """
+
+        kls = self._registry.get(class_path)
+
+        if isinstance(kls, str):
+            from django.utils.module_loading import import_string
+
+            kls = import_string(kls)
+            self._check(kls)
+            self._registry[class_path] = kls
+
+        return kls
+
+    def get_notification_classes(self):
+        """
+        Returns all registered notification classes, importing the ones registered by their path
         """
 
-        self._registry.remove(kls)
+        return [self.get(class_path) for class_path in list(self._registry)]
+
+    @staticmethod
+    def _check(kls):
+        from .base import NotificationBase
+
+        if not issubclass(kls, NotificationBase):
+            raise ValueError("Notification must subclass NotificationBase.")
 
     def register_decorator(self):
         """
@@ -3,13 +3,161 @@ Admin for notifications
 """
 
 from functools import update_wrapper
+from django.conf import settings
 from django.contrib import admin, messages
 from django.contrib.admin.options import csrf_protect_m
 from django.contrib.admin.utils import unquote
+from django.contrib.admin.views.main import PAGE_VAR, ChangeList
+from django.core.paginator import Paginator
+from django.db import connections
+from django.http import QueryDict
 from django.urls import re_path, reverse
+from django.utils.functional import cached_property
 from django.utils.safestring import mark_safe
 
 from .models import Notification
+from .recipients import normalize_recipient
+from .search import get_search_backend
+from .utils import queue_notifications, resend_notifications
+
+# columns the changelist never shows, which can hold the bulk of a row
+DEFERRED_CHANGELIST_FIELDS = (
+    "text_content",
+    "html_content",
+    "attachments",
+    "extra_data",
+    "error_message",
+)
+
+
+def get_estimated_count(queryset):
+    """
+    Returns the row count the database estimates for an unfiltered queryset,
+    or None when the count should be exact: the queryset is filtered, the database keeps no estimate,
+    or the estimate is below HERALD_ADMIN_ESTIMATED_COUNT_THRESHOLD
+    """
+
+    threshold = getattr(settings, "HERALD_ADMIN_ESTIMATED_COUNT_THRESHOLD", 100000)
+
+    if threshold is None or queryset.query.where:
+        return None
+
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+
+    if connection.vendor == "postgresql":
+        sql = "SELECT reltuples FROM pg_class WHERE oid = to_regclass(%s)"
+        params = [connection.ops.quote_name(table)]
+    elif connection.vendor == "mysql":
+        sql = (
+            "SELECT table_rows FROM information_schema.tables "
+            "WHERE table_schema = DATABASE() AND table_name = %s"
+        )
+        params = [table]
+    else:
+        return None
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+
+    # postgresql reports -1 for tables that were never analyzed
+    if row is None or row[0] is None or row[0] < threshold:
+        return None
+
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that uses the database's estimate of the row count for big unfiltered tables,
+    instead of counting every row
+    """
+
+    @cached_property
+    def count(self):
+        estimate = get_estimated_count(self.object_list)
+
+        if estimate is not None:
+            return estimate
+
+        return super().count
+
+
+class NotificationClassFilter(admin.SimpleListFilter):
+    """
+    Filters by notification class, with the choices read from the Notification table
+    rather than from the distinct classes of all sent notifications
+    """
+
+    title = "notification class"
+    parameter_name = "notification_class"
+
+    def lookups(self, request, model_admin):
+        return [
+            (notification.notification_class, str(notification))
+            for notification in Notification.objects.order_by("notification_class")
+        ]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(notification_class=self.value())
+        return queryset
+
+
+class RecipientFilter(admin.ListFilter):
+    """
+    Filters by a recipient typed in, through the normalized recipients rather than a scan of the recipients column
+    """
+
+    title = "recipient"
+    parameter_name = "recipient"
+    template = "admin/herald/recipient_filter.html"
+
+    def __init__(self, request, params, model, model_admin):
+        super().__init__(request, params, model, model_admin)
+        value = params.pop(self.parameter_name, None)
+        if isinstance(value, list):
+            # django 5.0+ passes every value of the parameter
+            value = value[-1] if value else None
+        self.recipient = value.strip() if value else None
+
+    def has_output(self):
+        return True
+
+    def expected_parameters(self):
+        return [self.parameter_name]
+
+    def queryset(self, request, queryset):
+        if self.recipient:
+            return queryset.filter(
+                recipient_addresses__address=normalize_recipient(self.recipient)
+            )
+        return queryset
+
+    def choices(self, changelist):
+        query_string = changelist.get_query_string(
+            remove=[self.parameter_name, PAGE_VAR]
+        )
+        yield {
+            "parameter_name": self.parameter_name,
+            "value": self.recipient or "",
+            # the other filters, search and ordering are kept when the form is submitted
+            "hidden_params": [
+                (name, value)
+                for name, values in QueryDict(query_string[1:]).lists()
+                for value in values
+            ],
+        }
+
+
+class SentNotificationChangeList(ChangeList):
+    def get_queryset(self, request, *args, **kwargs):
+        return (
+            super()
+            .get_queryset(request, *args, **kwargs)
+            .defer(*DEFERRED_CHANGELIST_FIELDS)
+        )
 
 
 class SentNotificationAdmin(admin.ModelAdmin):
@@ -24,8 +172,11 @@ class SentNotificationAdmin(admin.ModelAdmin):
         "date_sent",
         "status",
     )
-    list_filter = ("status", "notification_class")
+    list_filter = ("status", NotificationClassFilter, RecipientFilter)
     date_hierarchy = "date_sent"
+    paginator = EstimatedCountPaginator
+    # the unfiltered count next to the filtered one would count the whole table
+    show_full_result_count = False
     readonly_fields = ("resend",)
     search_fields = (
         "recipients",
@@ -35,12 +186,64 @@ class SentNotificationAdmin(admin.ModelAdmin):
         "sent_from",
     )
     autocomplete_fields = ("user",)
+    actions = ("resend_selected", "queue_selected")
+
+    def get_changelist(self, request, **kwargs):
+        return SentNotificationChangeList
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Searches with the backend set by HERALD_SEARCH_BACKEND, which uses an index instead of scanning the table
+        """
+
+        backend = get_search_backend()
+
+        if backend is None or not search_term.strip():
+            return super().get_search_results(request, queryset, search_term)
+
+        return backend.search(queryset, search_term), False
+
+    @admin.action(
+        description="Resend selected sent notifications", permissions=("change",)
+    )
+    def resend_selected(self, request, queryset):
+        """
+        Resends the selected notifications in batches, each over one connection
+        """
+
+        resent, total = resend_notifications(queryset)
+
+        self.message_user(
+            request,
+            "{} of {} notification(s) were resent successfully.".format(resent, total),
+            messages.SUCCESS if resent == total else messages.WARNING,
+        )
+
+    @admin.action(
+        description="Queue selected sent notifications for resending",
+        permissions=("change",),
+    )
+    def queue_selected(self, request, queryset):
+        """
+        Queues the selected notifications for the heraldworker command, so the request returns immediately
+        """
+
+        queued = queue_notifications(queryset)
+
+        self.message_user(
+            request,
+            "{} notification(s) were queued for resending.".format(queued),
+            messages.SUCCESS,
+        )
 
     def resend(self, obj):
         """
         Creates a link field that takes user to re-send view to resend the notification
         """
 
+        if not obj.content_stored:
+            return "The content of this notification was not stored."
+
         opts = self.model._meta  # pylint: disable=W0212
         resend_url = reverse(
             "admin:%s_%s_resend" % (opts.app_label, opts.model_name),
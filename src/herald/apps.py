@@ -2,10 +2,16 @@
 Django app config for herald. Using this to call autodiscover
 """
 
-from django.apps import AppConfig
+import logging
+
+from django.apps import AppConfig, apps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
 from django.db.models.signals import post_migrate
 from django.db.utils import OperationalError, ProgrammingError
 
+logger = logging.getLogger(__name__)
+
 
 class HeraldConfig(AppConfig):
     """
@@ -16,9 +22,20 @@ class HeraldConfig(AppConfig):
     name = "herald"
 
     def ready(self):
-        self.module.autodiscover()
+        from . import signals  # noqa: F401
+
+        if getattr(settings, "HERALD_AUTODISCOVER", True):
+            self.module.autodiscover()
+
+        if apps.is_installed("django.contrib.admin") and getattr(
+            settings, "HERALD_REGISTER_ADMIN", True
+        ):
+            self.register_admins()
 
-        self.register_admins()
+        if getattr(settings, "HERALD_TEMPLATE_CACHE_WARM", False):
+            from .base import warm_template_cache
+
+            warm_template_cache()
 
         post_migrate.connect(register_notifications, sender=self)
 
@@ -41,29 +58,73 @@ class HeraldConfig(AppConfig):
             admin.site.register(SentNotification, SentNotificationAdmin)
 
 
-def register_notifications(sender, **kwargs):
+def register_notifications(sender, using=DEFAULT_DB_ALIAS, **kwargs):
     """
     Register notification classes after migrations have run.
+    The existing rows are read once, then missing ones are created and changed ones updated in bulk.
+    Rows of classes that are no longer registered are deleted if HERALD_DELETE_STALE_NOTIFICATIONS is True,
+    and otherwise logged.
     """
     from herald import registry
 
     Notification = sender.get_model("Notification")
 
     try:
-        # add any new notifications to database.
-        for _, klass in enumerate(registry._registry):
-            notification, created = Notification.objects.get_or_create(
-                notification_class=klass.get_class_path(),
-                defaults={
-                    "verbose_name": klass.get_verbose_name(),
-                    "can_disable": klass.can_disable,
-                },
+        existing = Notification.objects.using(using).in_bulk(
+            field_name="notification_class"
+        )
+
+        missing = []
+        changed = []
+
+        classes = registry.get_notification_classes()
+
+        for klass in classes:
+            class_path = klass.get_class_path()
+            verbose_name = klass.get_verbose_name()
+            can_disable = klass.can_disable
+            notification = existing.get(class_path)
+
+            if notification is None:
+                # add any new notifications to database.
+                missing.append(
+                    Notification(
+                        notification_class=class_path,
+                        verbose_name=verbose_name,
+                        can_disable=can_disable,
+                    )
+                )
+            elif (
+                notification.verbose_name != verbose_name
+                or notification.can_disable != can_disable
+            ):
+                notification.verbose_name = verbose_name
+                notification.can_disable = can_disable
+                changed.append(notification)
+
+        if missing:
+            # another process migrating at the same time may have added them already
+            Notification.objects.using(using).bulk_create(
+                missing, ignore_conflicts=True
+            )
+
+        if changed:
+            Notification.objects.using(using).bulk_update(
+                changed, ["verbose_name", "can_disable"]
             )
 
-            if not created:
-                notification.verbose_name = klass.get_verbose_name()
-                notification.can_disable = klass.can_disable
-                notification.save()
+        stale = set(existing) - set(klass.get_class_path() for klass in classes)
+
+        if stale and getattr(settings, "HERALD_DELETE_STALE_NOTIFICATIONS", False):
+            Notification.objects.using(using).filter(
+                notification_class__in=stale
+            ).delete()
+        elif stale:
+            logger.warning(
+                "Notification classes are no longer registered: %s. "
+                "Set HERALD_DELETE_STALE_NOTIFICATIONS = True to delete them.",
+                ", ".join(sorted(stale)),
+            )
 
     except (OperationalError, ProgrammingError):
         # if the table is not created yet, just keep going.
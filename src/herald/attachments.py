@@ -0,0 +1,371 @@
+"""
+Encoding of notification attachments, and content addressed storage of them
+"""
+
+import base64
+import hashlib
+import json
+from datetime import timedelta
+from email import message_from_bytes
+from email.message import Message
+from email.mime.base import MIMEBase
+from mimetypes import guess_type
+
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.db import router, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .utils import get_sent_notification_model
+
+STORED_ATTACHMENTS_VERSION = 1
+ENCODED_ATTACHMENTS_VERSION = 1
+GRACE_PERIOD = timedelta(days=1)
+# last_used is only written again once it is this old, well within the grace period,
+# so an attachment shared by a bulk send does not have its row updated for every message
+LAST_USED_INTERVAL = GRACE_PERIOD / 24
+
+
+class StoredMIMEPart(MIMEBase):
+    """
+    A MIME attachment rebuilt from its stored bytes.
+    Subclasses MIMEBase so it is attached to emails as is.
+    """
+
+    def __init__(self, policy=None):
+        # called by the email parser, which sets the headers and payload itself
+        Message.__init__(self, policy=policy)
+
+
+def get_attachment_storage():
+    """
+    Returns the storage set by HERALD_ATTACHMENT_STORAGE, or None when attachments are stored in the row.
+    The setting is the alias of a storage in the STORAGES setting or the dotted path to a storage class,
+    which is created with the HERALD_ATTACHMENT_STORAGE_OPTIONS keyword arguments.
+    """
+
+    storage = getattr(settings, "HERALD_ATTACHMENT_STORAGE", None)
+
+    if not storage:
+        return None
+
+    if storage in getattr(settings, "STORAGES", {}):
+        from django.core.files.storage import storages
+
+        return storages[storage]
+
+    return import_string(storage)(
+        **getattr(settings, "HERALD_ATTACHMENT_STORAGE_OPTIONS", {})
+    )
+
+
+def get_attachment_path(digest):
+    return "{}{}".format(
+        getattr(settings, "HERALD_ATTACHMENT_STORAGE_PREFIX", "herald/attachments/"),
+        digest,
+    )
+
+
+def is_stored_attachments(value):
+    return value.startswith('{"stored_attachments"')
+
+
+def is_encoded_attachments(value):
+    return value.startswith('{"encoded_attachments"')
+
+
+def _read_file(attachment):
+    attachment.open("rb")
+    try:
+        return attachment.read()
+    finally:
+        attachment.close()
+
+
+def encode_attachments(attachments):
+    """
+    Returns the value for the attachments column holding the attachments themselves:
+    versioned JSON with base64 content, and text content kept as text.
+    Only (filename, content, mimetype) tuples, files and MIME parts are accepted.
+    """
+
+    encoded = []
+
+    for attachment in attachments:
+        if isinstance(attachment, MIMEBase):
+            encoded.append(
+                {
+                    "type": "mime",
+                    "data": base64.b64encode(attachment.as_bytes()).decode("ascii"),
+                }
+            )
+            continue
+
+        if isinstance(attachment, File):
+            filename, content, mimetype = (
+                attachment.name,
+                _read_file(attachment),
+                guess_type(attachment.name)[0],
+            )
+        else:
+            filename, content, mimetype = attachment
+
+        ref = {"type": "file", "filename": filename, "mimetype": mimetype}
+
+        if isinstance(content, str):
+            ref["text"] = content
+        else:
+            ref["data"] = base64.b64encode(content).decode("ascii")
+
+        encoded.append(ref)
+
+    return json.dumps(
+        {"encoded_attachments": ENCODED_ATTACHMENTS_VERSION, "attachments": encoded}
+    )
+
+
+def decode_attachments(value):
+    """
+    Reads the attachments of a value from encode_attachments, store_attachments,
+    or from jsonpickle, which older versions wrote
+    """
+
+    if is_stored_attachments(value):
+        return load_attachments(value)
+
+    if not is_encoded_attachments(value):
+        # only imported for rows written before the encoded format
+        import jsonpickle
+
+        return jsonpickle.loads(value)
+
+    attachments = []
+
+    for ref in json.loads(value)["attachments"]:
+        if ref["type"] == "mime":
+            attachments.append(
+                message_from_bytes(base64.b64decode(ref["data"]), _class=StoredMIMEPart)
+            )
+        elif "text" in ref:
+            attachments.append((ref["filename"], ref["text"], ref["mimetype"]))
+        else:
+            attachments.append(
+                (ref["filename"], base64.b64decode(ref["data"]), ref["mimetype"])
+            )
+
+    return attachments
+
+
+def _hash(content):
+    """
+    Hashes the content, files in chunks rather than read into memory.
+    returns the digest and size of the content, and the content as a File to save
+    """
+
+    if isinstance(content, File):
+        sha = hashlib.sha256()
+        size = 0
+        content.open("rb")
+        for chunk in content.chunks():
+            sha.update(chunk)
+            size += len(chunk)
+        content.seek(0)
+    else:
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        sha = hashlib.sha256(content)
+        size = len(content)
+        content = ContentFile(content)
+
+    return sha.hexdigest(), size, content
+
+
+def store_attachments(attachments, storage):
+    """
+    Saves the attachments in the storage and returns the value for the attachments column,
+    which only holds references to the stored content
+    """
+
+    StoredAttachment = django_apps.get_model("herald", "StoredAttachment")
+
+    refs = []
+    sizes = {}
+    contents = {}
+
+    for attachment in attachments:
+        if isinstance(attachment, MIMEBase):
+            digest, sizes[digest], contents[digest] = _hash(attachment.as_bytes())
+            refs.append({"type": "mime", "ref": digest})
+        elif isinstance(attachment, File):
+            digest, sizes[digest], contents[digest] = _hash(attachment)
+            refs.append(
+                {
+                    "type": "file",
+                    "filename": attachment.name,
+                    "mimetype": guess_type(attachment.name)[0],
+                    "ref": digest,
+                }
+            )
+        else:
+            filename, content, mimetype = attachment
+            digest, sizes[digest], contents[digest] = _hash(content)
+            refs.append(
+                {
+                    "type": "file",
+                    "filename": filename,
+                    "mimetype": mimetype,
+                    "ref": digest,
+                }
+            )
+
+    # the rows are created or marked as used before the files are checked,
+    # so the cleanup does not delete a file this send relies on
+    now = timezone.now()
+    StoredAttachment.objects.bulk_create(
+        [
+            StoredAttachment(digest=digest, size=size, last_used=now)
+            for digest, size in sizes.items()
+        ],
+        ignore_conflicts=True,
+    )
+    # keeps attachments that are used again from being collected
+    StoredAttachment.objects.filter(
+        pk__in=sizes, last_used__lt=now - LAST_USED_INTERVAL
+    ).update(last_used=now)
+
+    for digest, content in contents.items():
+        path = get_attachment_path(digest)
+        if not storage.exists(path):
+            storage.save(path, content)
+
+    for attachment in attachments:
+        if isinstance(attachment, File):
+            attachment.close()
+
+    return json.dumps(
+        {"stored_attachments": STORED_ATTACHMENTS_VERSION, "attachments": refs}
+    )
+
+
+def load_attachments(value, storage=None):
+    """
+    Reads the attachments referenced by a value from store_attachments out of the storage
+    """
+
+    storage = storage or get_attachment_storage()
+
+    if storage is None:
+        raise ValueError(
+            "HERALD_ATTACHMENT_STORAGE must be set to load stored attachments."
+        )
+
+    attachments = []
+
+    for ref in json.loads(value)["attachments"]:
+        with storage.open(get_attachment_path(ref["ref"]), "rb") as f:
+            data = f.read()
+
+        if ref["type"] == "mime":
+            attachments.append(message_from_bytes(data, _class=StoredMIMEPart))
+        else:
+            attachments.append((ref["filename"], data, ref["mimetype"]))
+
+    return attachments
+
+
+def link_stored_attachments(sent_notifications):
+    """
+    Records which stored attachments saved sent notifications reference, so unreferenced ones can be collected
+    """
+
+    SentNotification = get_sent_notification_model()
+    field = SentNotification._meta.get_field("stored_attachments")
+    through = field.remote_field.through
+
+    links = [
+        through(
+            **{
+                "{}_id".format(field.m2m_field_name()): sent_notification.pk,
+                "{}_id".format(field.m2m_reverse_field_name()): ref["ref"],
+            }
+        )
+        for sent_notification in sent_notifications
+        if sent_notification.attachments
+        and is_stored_attachments(sent_notification.attachments)
+        for ref in json.loads(sent_notification.attachments)["attachments"]
+    ]
+
+    if links:
+        through.objects.bulk_create(links, ignore_conflicts=True)
+
+
+def unlink_stored_attachments(sent_notifications):
+    """
+    Removes the references of saved sent notifications whose attachments were dropped,
+    so the stored attachments can be collected
+    """
+
+    SentNotification = get_sent_notification_model()
+    field = SentNotification._meta.get_field("stored_attachments")
+
+    field.remote_field.through.objects.filter(
+        **{"{}__in".format(field.m2m_field_name()): [x.pk for x in sent_notifications]}
+    ).delete()
+
+
+def delete_unreferenced_attachments(
+    grace_period=GRACE_PERIOD, batch_size=1000, max_batches=None
+):
+    """
+    Deletes stored attachments no sent notification references any more, from the database and the storage.
+    Attachments used within the grace period are kept, since their sent notification may not be saved yet.
+    At most max_batches batches are deleted, when it is given.
+    returns the number of attachments deleted
+    """
+
+    StoredAttachment = django_apps.get_model("herald", "StoredAttachment")
+    SentNotification = get_sent_notification_model()
+    field = SentNotification._meta.get_field("stored_attachments")
+    referenced = field.remote_field.through.objects.values(
+        "{}_id".format(field.m2m_reverse_field_name())
+    )
+
+    storage = get_attachment_storage()
+    cutoff = timezone.now() - grace_period
+    db = router.db_for_write(StoredAttachment)
+    unreferenced = (
+        StoredAttachment.objects.using(db)
+        .filter(last_used__lt=cutoff)
+        .exclude(pk__in=referenced)
+    )
+    deleted = 0
+    batches = 0
+
+    while max_batches is None or batches < max_batches:
+        batches += 1
+        digests = list(unreferenced.values_list("pk", flat=True)[:batch_size])
+
+        if not digests:
+            return deleted
+
+        with transaction.atomic(using=db):
+            # the conditions are checked again with the rows locked, since a send may have used
+            # an attachment or referenced it since it was selected
+            removed = list(
+                unreferenced.filter(pk__in=digests)
+                .select_for_update()
+                .values_list("pk", flat=True)
+            )
+            # a raw delete, so references added meanwhile fail instead of being cascaded
+            unreferenced.filter(pk__in=removed)._raw_delete(using=db)
+
+        if storage is not None:
+            for digest in removed:
+                storage.delete(get_attachment_path(digest))
+
+        deleted += len(removed)
+
+    return deleted
@@ -1,24 +1,209 @@
+import hashlib
+import inspect
 import json
+import random
 import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 from email.mime.base import MIMEBase
-from mimetypes import guess_type
 
-import jsonpickle
 import django
 from django.conf import settings
 from django.contrib.sites.models import Site
-from django.core.files import File
-from django.core.mail import EmailMultiAlternatives
-from django.template import TemplateDoesNotExist
-from django.template.loader import render_to_string
+from django.core.exceptions import ImproperlyConfigured
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import connections, router
+from django.template import TemplateDoesNotExist, loader
 from django.utils import timezone
-
-from herald.utils import get_sent_notification_model
+from django.utils.functional import cached_property
+
+from herald.attachments import (
+    encode_attachments,
+    get_attachment_storage,
+    link_stored_attachments,
+    store_attachments,
+    unlink_stored_attachments,
+)
+from herald.contents import store_contents
+from herald.recipients import link_recipients, normalize_recipient
+from herald.utils import (
+    DUPLICATE_CACHE_KEY,
+    RETENTION_CACHE_KEY,
+    TokenBucket,
+    delete_expired_notifications,
+    get_cache,
+    get_disabled_notifications,
+    get_disabled_notifications_for_users,
+    get_sent_notification_model,
+)
 
 use_legacy_mixed_subtype: bool = False
 if django.VERSION < (5, 0):
     use_legacy_mixed_subtype: bool = True
 
+_template_cache = {}
+_html2text_cache = OrderedDict()
+_html2text_cache_lock = threading.Lock()
+_twilio_client = None
+_twilio_client_lock = threading.Lock()
+_twilio_rate_limiter = None
+_accepts_connection_cache = {}
+
+
+def get_template(template_name):
+    """
+    Returns the compiled template, loaded once per process unless HERALD_TEMPLATE_CACHE is False.
+    Missing templates are remembered too, so a failed lookup is not repeated.
+    """
+
+    if not getattr(settings, "HERALD_TEMPLATE_CACHE", True):
+        return loader.get_template(template_name)
+
+    try:
+        template = _template_cache[template_name]
+    except KeyError:
+        try:
+            template = loader.get_template(template_name)
+        except TemplateDoesNotExist:
+            template = None
+        _template_cache[template_name] = template
+
+    if template is None:
+        raise TemplateDoesNotExist(template_name)
+
+    return template
+
+
+def clear_template_cache():
+    _template_cache.clear()
+
+
+def clear_html2text_cache():
+    with _html2text_cache_lock:
+        _html2text_cache.clear()
+
+
+def get_twilio_client():
+    """
+    Returns the Twilio client, created once per process and shared by all threads,
+    so its pooled HTTP session keeps connections to the Twilio API alive between messages
+    """
+
+    global _twilio_client
+
+    client = _twilio_client
+    if client is None:
+        with _twilio_client_lock:
+            if _twilio_client is None:
+                _twilio_client = _create_twilio_client()
+            client = _twilio_client
+
+    return client
+
+
+def clear_twilio_client():
+    global _twilio_client, _twilio_rate_limiter
+
+    with _twilio_client_lock:
+        _twilio_client = None
+        _twilio_rate_limiter = None
+
+
+def get_twilio_rate_limiter():
+    """
+    Returns the token bucket that limits the messages sent per second to HERALD_TWILIO_RATE_LIMIT,
+    shared by all threads of the process, or None when there is no limit
+    """
+
+    global _twilio_rate_limiter
+
+    rate = getattr(settings, "HERALD_TWILIO_RATE_LIMIT", None)
+    if not rate:
+        return None
+
+    rate_limiter = _twilio_rate_limiter
+    if rate_limiter is None:
+        with _twilio_client_lock:
+            if _twilio_rate_limiter is None:
+                _twilio_rate_limiter = TokenBucket(rate)
+            rate_limiter = _twilio_rate_limiter
+
+    return rate_limiter
+
+
+def _create_twilio_client():
+    try:
+        # twilio version 6
+        from twilio.rest import Client
+    except ImportError:
+        try:
+            # twillio version < 6
+            from twilio.rest import TwilioRestClient as Client
+        except ImportError:
+            raise Exception("Twilio is required for sending a TwilioTextNotification.")
+
+    try:
+        account_sid = settings.TWILIO_ACCOUNT_SID
+        auth_token = settings.TWILIO_AUTH_TOKEN
+    except AttributeError:
+        raise Exception(
+            "TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN settings are required for sending a TwilioTextNotification"
+        )
+
+    try:
+        from requests.adapters import DEFAULT_POOLSIZE, HTTPAdapter
+        from twilio.http.http_client import TwilioHttpClient
+    except ImportError:
+        # twillio version < 6 has no pluggable http client
+        return Client(account_sid, auth_token)
+
+    http_client = TwilioHttpClient(pool_connections=True)
+
+    # keep a pooled connection for every thread sending concurrently
+    concurrency = getattr(settings, "HERALD_TWILIO_CONCURRENCY", 1)
+    if concurrency > DEFAULT_POOLSIZE:
+        http_client.session.mount("https://", HTTPAdapter(pool_maxsize=concurrency))
+
+    return Client(account_sid, auth_token, http_client=http_client)
+
+
+def warm_template_cache():
+    """
+    Loads the templates of every registered notification class into the template cache
+    """
+
+    from herald import registry
+
+    for klass in registry.get_notification_classes():
+        notification = klass.__new__(klass)
+
+        for render_type in klass.render_types:
+            try:
+                get_template(notification.get_template_name(render_type))
+            except (TemplateDoesNotExist, ValueError):
+                # reported when the notification is rendered
+                pass
+
+
+def _accepts_connection(klass):
+    """
+    Returns whether the _send of a notification class takes a connection argument, checked once per class,
+    since _send overrides written against the documented signature do not
+    """
+
+    try:
+        return _accepts_connection_cache[klass]
+    except KeyError:
+        parameters = inspect.signature(klass._send).parameters.values()
+        accepts = any(
+            parameter.name == "connection" or parameter.kind == parameter.VAR_KEYWORD
+            for parameter in parameters
+        )
+        _accepts_connection_cache[klass] = accepts
+        return accepts
+
 
 class NotificationBase:
     """
@@ -31,6 +216,13 @@ class NotificationBase:
     user = None
     can_disable = True
     verbose_name = None
+    content_policy = None
+    # seconds or timedelta within which sending the same content to the same recipients again is suppressed
+    duplicate_window = None
+
+    CONTENT_POLICY_ALL = "all"
+    CONTENT_POLICY_METADATA = "metadata"
+    CONTENT_POLICY_FAILED = "failed"
 
     def get_context_data(self):
         """
@@ -44,6 +236,15 @@ class NotificationBase:
 
         return context
 
+    @cached_property
+    def context_data(self):
+        """
+        The context data from get_context_data, computed once per notification instance
+        and shared by send, preview and get_subject
+        """
+
+        return self.get_context_data()
+
     @classmethod
     def get_verbose_name(cls):
         if cls.verbose_name:
@@ -70,15 +271,141 @@ class NotificationBase:
                 % (render_type, self.render_types)
             )
 
-        return self.render(render_type, self.get_context_data())
+        return self.render(render_type, self.context_data)
 
-    def send(self, raise_exception=False, user=None):
+    def send(self, raise_exception=False, user=None, deferred=False):
         """
         Handles the preparing the notification for sending. Called to trigger the send from code.
         If raise_exception is True, it will raise any exceptions rather than simply logging them.
-        returns boolean whether or not the notification was sent successfully
+        If deferred is True, the notification is only queued and sent later by the heraldworker command.
+        returns boolean whether or not the notification was sent (or queued) successfully
         """
-        context = self.get_context_data()
+
+        sent_notification = self._build_sent_notification(user=user)
+        self._claim_sends([sent_notification])
+
+        if sent_notification.status == sent_notification.STATUS_SUPPRESSED:
+            sent_notification.date_sent = timezone.now()
+            sent_notification.save()
+            link_recipients([sent_notification])
+            return True
+
+        if deferred:
+            # queued notifications keep their content until the worker sends them
+            store_contents([sent_notification])
+            sent_notification.status = sent_notification.STATUS_QUEUED
+            sent_notification.date_sent = timezone.now()
+            sent_notification.save()
+            link_stored_attachments([sent_notification])
+            link_recipients([sent_notification])
+            return True
+
+        return self.resend(sent_notification, raise_exception=raise_exception)
+
+    @classmethod
+    def send_many(
+        cls, notifications, raise_exception=False, batch_size=500, deferred=False
+    ):
+        """
+        Sends many notifications of this class in batches.
+        Each batch is saved with a single bulk insert, delivered over one shared connection
+        and has its statuses written back with a single bulk update.
+        The user for each sent notification is taken from the notification's user attribute.
+        If deferred is True, the notifications are only queued for the heraldworker command.
+        returns a list of booleans whether or not each notification was sent (or queued) successfully
+        """
+
+        results = []
+        batch = []
+
+        for notification in notifications:
+            if not isinstance(notification, cls):
+                raise ValueError(
+                    "send_many() only accepts instances of {}.".format(cls.__name__)
+                )
+
+            batch.append(notification._build_sent_notification(user=notification.user))
+
+            if len(batch) >= batch_size:
+                results.extend(cls._send_batch(batch, raise_exception, deferred))
+                batch = []
+
+        if batch:
+            results.extend(cls._send_batch(batch, raise_exception, deferred))
+
+        cls._delete_expired_notifications()
+
+        return results
+
+    @classmethod
+    def _send_batch(cls, sent_notifications, raise_exception=False, deferred=False):
+        """
+        Saves a batch of unsaved sent notifications as pending and delivers them,
+        or saves them as queued when deferred
+        """
+
+        SentNotification = get_sent_notification_model()
+
+        now = timezone.now()
+        for sent_notification in sent_notifications:
+            sent_notification.date_sent = now
+            if deferred:
+                sent_notification.status = sent_notification.STATUS_QUEUED
+
+        cls._claim_sends(sent_notifications)
+
+        # unless all content is kept, the rows are inserted with their metadata only
+        # and the content is saved once the policy decided to keep it after delivery
+        stash = None
+        if deferred or cls.get_content_policy() == cls.CONTENT_POLICY_ALL:
+            store_contents(sent_notifications)
+        else:
+            stash = [
+                (x.text_content, x.html_content, x.attachments)
+                for x in sent_notifications
+            ]
+            for sent_notification in sent_notifications:
+                sent_notification.clear_content()
+
+        db = router.db_for_write(SentNotification)
+        if connections[db].features.can_return_rows_from_bulk_insert:
+            SentNotification.objects.using(db).bulk_create(sent_notifications)
+        else:
+            # primary keys are needed for the stored attachments and the bulk update of the statuses
+            for sent_notification in sent_notifications:
+                sent_notification.save(using=db)
+
+        link_recipients(sent_notifications)
+
+        if stash is None:
+            link_stored_attachments(sent_notifications)
+        else:
+            for sent_notification, content in zip(sent_notifications, stash):
+                (
+                    sent_notification.text_content,
+                    sent_notification.html_content,
+                    sent_notification.attachments,
+                ) = content
+
+        if deferred:
+            return [True] * len(sent_notifications)
+
+        deliverable = [x for x in sent_notifications if x.status != x.STATUS_SUPPRESSED]
+
+        results = iter(cls.resend_many(deliverable, raise_exception=raise_exception))
+
+        # suppressed duplicates count as sent, like notifications users disabled
+        return [
+            True if x.status == x.STATUS_SUPPRESSED else next(results)
+            for x in sent_notifications
+        ]
+
+    def _build_sent_notification(self, user=None):
+        """
+        Renders the notification and returns an unsaved sent notification for it
+        """
+
+        context = self.context_data
 
         recipients = self.get_recipients()
 
@@ -98,55 +425,52 @@ class NotificationBase:
 
         SentNotification = get_sent_notification_model()
 
-        sent_notification = SentNotification(
+        return SentNotification(
             recipients=",".join(recipients),
             text_content=text_content,
             html_content=html_content,
             sent_from=sent_from,
             subject=subject,
-            extra_data=json.dumps(extra_data) if extra_data else None,
+            extra_data=extra_data or None,
             notification_class=self.get_class_path(),
             attachments=self._get_encoded_attachments(),
             user=user,
         )
 
-        return self.resend(sent_notification, raise_exception=raise_exception)
-
     def _get_encoded_attachments(self):
         attachments = self.get_attachments()
 
-        new_attachments = []
+        storage = get_attachment_storage()
+        if storage is not None and attachments:
+            return store_attachments(attachments, storage)
 
-        for attachment in attachments or []:
-            if isinstance(attachment, File):
-                # cannot do with attachment.open() since django 1.11 doesn't support that
-                attachment.open()
-                new_attachments.append(
-                    (attachment.name, attachment.read(), guess_type(attachment.name)[0])
-                )
-                attachment.close()
-            else:
-                new_attachments.append(attachment)
-
-        return jsonpickle.dumps(new_attachments)
+        return encode_attachments(attachments or [])
 
     @staticmethod
     def _delete_expired_notifications():
         """
-        This deletes any notifications that have passed the retention time setting
+        This deletes any notifications that have passed the retention time setting.
+        Runs at most once per HERALD_NOTIFICATION_RETENTION_INTERVAL across all processes sharing the cache,
+        and deletes one batch at most, so a send never pays for a whole backlog, which heraldcleanup drains.
         """
-        retention_time = getattr(settings, "HERALD_NOTIFICATION_RETENTION_TIME", None)
 
-        if not retention_time:
+        if not getattr(settings, "HERALD_NOTIFICATION_RETENTION_TIME", None):
             return
 
-        SentNotification = get_sent_notification_model()
+        if not getattr(settings, "HERALD_NOTIFICATION_RETENTION_ON_SEND", True):
+            return
 
-        cutoff_date = timezone.now() - retention_time
+        interval = getattr(
+            settings, "HERALD_NOTIFICATION_RETENTION_INTERVAL", timedelta(hours=1)
+        )
 
-        notifications = SentNotification.objects.filter(date_sent__lt=cutoff_date)
-        count = notifications.delete()
-        print("Deleted {} expired notifications.".format(count))
+        # cache.add is atomic, so only one process wins the right to run the cleanup per interval
+        if interval and not get_cache().add(
+            RETENTION_CACHE_KEY, True, interval.total_seconds()
+        ):
+            return
+
+        delete_expired_notifications(max_batches=1)
 
     def get_recipients(self):
         """
@@ -185,6 +509,44 @@ class NotificationBase:
         """
         return None
 
+    def get_template_name(self, render_type):
+        """
+        Returns the path of the template for the render type
+        """
+
+        # template_name is a dict, e.g.
+        # {
+        #     "text": "path/to/welcome_email_t.txt",
+        #     "html": "path/to/welcome_email_h.html"
+        # }
+        if isinstance(self.template_name, dict):
+            if render_type not in self.template_name:
+                raise ValueError(
+                    "template_name is a dict, but key '{}' is missing".format(
+                        render_type
+                    )
+                )
+            return self.template_name[render_type]
+
+        # template_name is a string containing slashes
+        # e.g. "path/to/welcome_email"
+        # will look for templates/path/to/welcome_email.txt
+        #           and templates/path/to/welcome_email.html
+        if self.template_name and "/" in self.template_name:
+            return "{}.{}".format(
+                self.template_name,
+                "txt" if render_type == "text" else render_type,
+            )
+
+        # default behaviour, e.g. "welcome_email"
+        # will look for herald/text/welcome_email.txt
+        #           and herald/html/welcome_email.html
+        return "herald/{}/{}.{}".format(
+            render_type,
+            self.template_name,
+            "txt" if render_type == "text" else render_type,
+        )
+
     def render(self, render_type, context):
         """
         Renders the template
@@ -196,49 +558,10 @@ class NotificationBase:
 
         assert render_type in self.render_types, "Invalid Render Type"
 
-        try:
-            # template_name is a dict, e.g.
-            # {
-            #     "text": "path/to/welcome_email_t.txt",
-            #     "html": "path/to/welcome_email_h.html"
-            # }
-            if isinstance(self.template_name, dict):
-                if render_type not in self.template_name:
-                    raise ValueError(
-                        "template_name is a dict, but key '{}' is missing".format(
-                            render_type
-                        )
-                    )
-                content = render_to_string(
-                    self.template_name[render_type],
-                    context,
-                )
+        template_name = self.get_template_name(render_type)
 
-            # template_name is a string containing slashes
-            # e.g. "path/to/welcome_email"
-            # will look for templates/path/to/welcome_email.txt
-            #           and templates/path/to/welcome_email.html
-            elif self.template_name and "/" in self.template_name:
-                content = render_to_string(
-                    "{}.{}".format(
-                        self.template_name,
-                        "txt" if render_type == "text" else render_type,
-                    ),
-                    context,
-                )
-
-            # default behaviour, e.g. "welcome_email"
-            # will look for herald/text/welcome_email.txt
-            #           and herald/html/welcome_email.html
-            else:
-                content = render_to_string(
-                    "herald/{}/{}.{}".format(
-                        render_type,
-                        self.template_name,
-                        "txt" if render_type == "text" else render_type,
-                    ),
-                    context,
-                )
+        try:
+            content = get_template(template_name).render(context)
         except TemplateDoesNotExist:
             content = None
 
@@ -264,16 +587,350 @@ class NotificationBase:
         returns boolean whether or not the notification was sent successfully
         """
 
+        adding = sent_notification._state.adding
+        # new notifications and ones rendered again hold content that isn't saved yet
+        unsaved_content = adding or not sent_notification.content_stored
+
+        # the history of a notification whose content can't be rebuilt is kept as it is
+        if not cls._render_missing_content([sent_notification]):
+            return False
+
         # handle skipping a notification based on user preference
-        if hasattr(sent_notification.user, "usernotification"):
-            notifications = sent_notification.user.usernotification
-            if notifications.disabled_notifications.filter(
-                notification_class=cls.get_class_path()
-            ).exists():
-                sent_notification.date_sent = timezone.now()
-                sent_notification.status = sent_notification.STATUS_USER_DISABLED
-                sent_notification.save()
-                return True
+        if cls.get_class_path() in get_disabled_notifications(
+            sent_notification.user_id
+        ):
+            sent_notification.date_sent = timezone.now()
+            sent_notification.status = sent_notification.STATUS_USER_DISABLED
+        else:
+            try:
+                cls._deliver(sent_notification, raise_exception=raise_exception)
+            finally:
+                cls._release_sends([sent_notification])
+
+        changed = cls._apply_content_policy(
+            [sent_notification], [sent_notification] if unsaved_content else []
+        )
+        sent_notification.save()
+
+        if adding:
+            link_recipients([sent_notification])
+
+        if unsaved_content and sent_notification.content_stored:
+            link_stored_attachments([sent_notification])
+        elif changed and not adding:
+            unlink_stored_attachments(changed)
+
+        if sent_notification.status == sent_notification.STATUS_USER_DISABLED:
+            return True
+
+        cls._delete_expired_notifications()
+
+        return sent_notification.status == sent_notification.STATUS_SUCCESS
+
+    @classmethod
+    def resend_many(cls, sent_notifications, raise_exception=False):
+        """
+        Takes saved sent_notifications and sends them again over one shared connection.
+        The statuses are written back with a single bulk update.
+        returns a list of booleans whether or not each notification was sent successfully
+        """
+
+        if not sent_notifications:
+            return []
+
+        class_path = cls.get_class_path()
+        disabled = get_disabled_notifications_for_users(
+            [x.user_id for x in sent_notifications]
+        )
+
+        deliverable = cls._render_missing_content(sent_notifications)
+        unsaved_content = [x for x in deliverable if not x.content_stored]
+
+        connection = cls.get_connection() if _accepts_connection(cls) else None
+
+        if connection is not None:
+            try:
+                connection.open()
+            except Exception:  # pylint: disable=W0703
+                # each send retries the connection and records its own failure
+                pass
+
+        try:
+            for sent_notification in deliverable:
+                if class_path in disabled.get(sent_notification.user_id, ()):
+                    sent_notification.date_sent = timezone.now()
+                    sent_notification.status = sent_notification.STATUS_USER_DISABLED
+                else:
+                    cls._deliver(
+                        sent_notification,
+                        raise_exception=raise_exception,
+                        connection=connection,
+                    )
+        finally:
+            if connection is not None:
+                connection.close()
+
+            get_sent_notification_model().objects.bulk_update(
+                deliverable, ["status", "date_sent", "error_message"]
+            )
+            cls._release_sends(deliverable)
+
+        cls._save_content(cls._apply_content_policy(deliverable, unsaved_content))
+
+        deliverable = set(id(x) for x in deliverable)
+
+        return [
+            id(x) in deliverable
+            and x.status in (x.STATUS_SUCCESS, x.STATUS_USER_DISABLED)
+            for x in sent_notifications
+        ]
+
+    @classmethod
+    def get_duplicate_window(cls):
+        """
+        Returns the duplicate window of the class in seconds, or None when duplicates are sent
+        """
+
+        window = cls.duplicate_window
+
+        if isinstance(window, timedelta):
+            window = window.total_seconds()
+
+        return window or None
+
+    @classmethod
+    def get_duplicate_key(cls, sent_notification):
+        """
+        Returns the cache key of a send, from the class, the normalized recipients, the sender,
+        the rendered content, the extra data and the attachments
+        """
+
+        digest = hashlib.sha256(
+            "\0".join(
+                [
+                    cls.get_class_path(),
+                    ",".join(
+                        sorted(
+                            normalize_recipient(x)
+                            for x in sent_notification.get_recipients()
+                        )
+                    ),
+                    sent_notification.sent_from or "",
+                    sent_notification.subject or "",
+                    sent_notification.text_content or "",
+                    sent_notification.html_content or "",
+                    # cc, bcc, reply to and headers
+                    json.dumps(
+                        sent_notification.get_extra_data(), sort_keys=True, default=str
+                    ),
+                    sent_notification.attachments or "",
+                ]
+            ).encode("utf-8")
+        ).hexdigest()
+
+        return DUPLICATE_CACHE_KEY.format(digest)
+
+    @classmethod
+    def _claim_sends(cls, sent_notifications):
+        """
+        Claims the duplicate key of each unsaved sent notification with an atomic cache add.
+        Sent notifications whose key is already claimed within the duplicate window are marked as suppressed,
+        and only their metadata is kept.
+        """
+
+        window = cls.get_duplicate_window()
+
+        if not window:
+            return
+
+        cache = get_cache()
+
+        for sent_notification in sent_notifications:
+            if not cache.add(cls.get_duplicate_key(sent_notification), True, window):
+                sent_notification.status = sent_notification.STATUS_SUPPRESSED
+                sent_notification.clear_content()
+
+    @classmethod
+    def _release_sends(cls, sent_notifications):
+        """
+        Releases the duplicate keys of sent notifications that failed, so sending them again is not suppressed.
+        Called after delivery, before the content policy drops the content the key is made of,
+        so queued notifications the worker fails to send are released too.
+        """
+
+        if not cls.get_duplicate_window():
+            return
+
+        keys = [
+            cls.get_duplicate_key(x)
+            for x in sent_notifications
+            if x.status == x.STATUS_FAILED
+        ]
+
+        if keys:
+            get_cache().delete_many(keys)
+
+    @classmethod
+    def get_content_policy(cls):
+        """
+        Returns the content policy of the class, or the HERALD_CONTENT_POLICY setting when the class doesn't set one.
+        The policy is "all", "metadata", "failed" or the fraction of notifications whose content is kept.
+        """
+
+        policy = cls.content_policy
+        if policy is None:
+            policy = getattr(settings, "HERALD_CONTENT_POLICY", cls.CONTENT_POLICY_ALL)
+
+        if policy in (
+            cls.CONTENT_POLICY_ALL,
+            cls.CONTENT_POLICY_METADATA,
+            cls.CONTENT_POLICY_FAILED,
+        ):
+            return policy
+
+        if (
+            isinstance(policy, (int, float))
+            and not isinstance(policy, bool)
+            and 0 <= policy <= 1
+        ):
+            return float(policy)
+
+        raise ImproperlyConfigured(
+            "The content policy must be 'all', 'metadata', 'failed' or a fraction between 0 and 1, not {!r}.".format(
+                policy
+            )
+        )
+
+    @classmethod
+    def should_store_content(cls, sent_notification):
+        """
+        Returns whether the content of a delivered sent notification is kept, according to the content policy
+        """
+
+        policy = cls.get_content_policy()
+
+        if policy == cls.CONTENT_POLICY_ALL:
+            return True
+
+        if policy == cls.CONTENT_POLICY_METADATA:
+            return False
+
+        if policy == cls.CONTENT_POLICY_FAILED:
+            return sent_notification.status == sent_notification.STATUS_FAILED
+
+        return random.random() < policy
+
+    @classmethod
+    def from_sent_notification(cls, sent_notification):
+        """
+        Returns a notification to render the content of a sent notification saved without its content again,
+        or None if it can't be rebuilt, in which case the sent notification can't be resent.
+        Override this to build the notification from the sent notification's user or extra data.
+        """
+
+        return None
+
+    @classmethod
+    def _render_missing_content(cls, sent_notifications):
+        """
+        Renders the content again for sent notifications saved without it.
+        Those that can't be rebuilt are left unchanged, so they can't be resent.
+        returns the sent notifications that can be delivered
+        """
+
+        deliverable = []
+
+        for sent_notification in sent_notifications:
+            if sent_notification.has_content():
+                deliverable.append(sent_notification)
+                continue
+
+            notification = cls.from_sent_notification(sent_notification)
+
+            if notification is None:
+                continue
+
+            rendered = notification._build_sent_notification(
+                user=sent_notification.user
+            )
+            sent_notification.text_content = rendered.text_content
+            sent_notification.html_content = rendered.html_content
+            sent_notification.attachments = rendered.attachments
+            deliverable.append(sent_notification)
+
+        return deliverable
+
+    @classmethod
+    def _apply_content_policy(cls, sent_notifications, unsaved_content=()):
+        """
+        Keeps or drops the content of delivered sent notifications according to the content policy, without saving.
+        Kept content of the unsaved_content sent notifications, which is only in memory, is prepared to be saved.
+        returns the sent notifications whose content changed
+        """
+
+        unsaved = set(id(x) for x in unsaved_content)
+
+        if cls.get_content_policy() == cls.CONTENT_POLICY_ALL and not unsaved:
+            return []
+
+        changed = []
+        kept = []
+
+        for sent_notification in sent_notifications:
+            store = cls.should_store_content(sent_notification)
+
+            if id(sent_notification) in unsaved:
+                if store:
+                    sent_notification.content_stored = True
+                    kept.append(sent_notification)
+                else:
+                    sent_notification.clear_content()
+                changed.append(sent_notification)
+            elif sent_notification.content_stored and not store:
+                sent_notification.clear_content()
+                changed.append(sent_notification)
+
+        store_contents(kept)
+
+        return changed
+
+    @staticmethod
+    def _save_content(sent_notifications):
+        """
+        Writes the content fields changed by _apply_content_policy back with bulk updates
+        """
+
+        SentNotification = get_sent_notification_model()
+
+        kept = [x for x in sent_notifications if x.content_stored]
+        dropped = [x for x in sent_notifications if not x.content_stored]
+
+        if kept:
+            # deduplicated content is only saved through the body references,
+            # reading the content fields would return the referenced content
+            if getattr(settings, "HERALD_DEDUPLICATE_CONTENT", False):
+                fields = ["text_body", "html_body"]
+            else:
+                fields = ["text_content", "html_content"]
+            SentNotification.objects.bulk_update(
+                kept, fields + ["attachments", "content_stored"]
+            )
+            link_stored_attachments(kept)
+
+        if dropped:
+            SentNotification.objects.bulk_update(
+                dropped, list(SentNotification.CONTENT_FIELDS)
+            )
+            unlink_stored_attachments(dropped)
+
+    @classmethod
+    def _deliver(cls, sent_notification, raise_exception=False, connection=None):
+        """
+        Calls _send for the sent_notification and records the outcome on it, without saving
+        """
+
+        # only pass a connection along to _send implementations that can use one
+        kwargs = {"connection": connection} if connection is not None else {}
 
         try:
             cls._send(
@@ -284,6 +941,7 @@ class NotificationBase:
                 sent_notification.subject,
                 sent_notification.get_extra_data(),
                 sent_notification.get_attachments(),
+                **kwargs,
             )
             sent_notification.status = sent_notification.STATUS_SUCCESS
         except Exception as exc:  # pylint: disable=W0703
@@ -293,13 +951,16 @@ class NotificationBase:
 
             if raise_exception:
                 raise exc
+        finally:
+            sent_notification.date_sent = timezone.now()
 
-        sent_notification.date_sent = timezone.now()
-        sent_notification.save()
-
-        cls._delete_expired_notifications()
+    @classmethod
+    def get_connection(cls):
+        """
+        Returns a connection to share between many sends, or None if the transport does not use one
+        """
 
-        return sent_notification.status == sent_notification.STATUS_SUCCESS
+        return None
 
     @staticmethod
     def _send(
@@ -389,7 +1050,7 @@ class EmailNotification(NotificationBase):
                 content = None
 
             if content is None:
-                content = self.get_html2text_converter().handle(
+                content = self.html_to_text(
                     super(EmailNotification, self).render("html", context)
                 )
         else:
@@ -397,6 +1058,43 @@ class EmailNotification(NotificationBase):
 
         return content
 
+    @classmethod
+    def get_connection(cls):
+        return get_connection()
+
+    def html_to_text(self, html_content):
+        """
+        Converts the html to text with get_html2text_converter.
+        Keeps the last HERALD_HTML2TEXT_CACHE_SIZE conversions by content hash, so identical html is converted once.
+        """
+
+        if html_content is None:
+            return None
+
+        cache_size = getattr(settings, "HERALD_HTML2TEXT_CACHE_SIZE", 0)
+
+        if not cache_size:
+            return self.get_html2text_converter().handle(html_content)
+
+        key = (
+            self.get_class_path(),
+            hashlib.sha256(html_content.encode("utf-8")).digest(),
+        )
+
+        with _html2text_cache_lock:
+            if key in _html2text_cache:
+                _html2text_cache.move_to_end(key)
+                return _html2text_cache[key]
+
+        content = self.get_html2text_converter().handle(html_content)
+
+        with _html2text_cache_lock:
+            _html2text_cache[key] = content
+            while len(_html2text_cache) > cache_size:
+                _html2text_cache.popitem(last=False)
+
+        return content
+
     @staticmethod
     def get_html2text_converter():
         try:
@@ -435,6 +1133,7 @@ class EmailNotification(NotificationBase):
         subject=None,
         extra_data=None,
         attachments=None,
+        connection=None,
     ):
         extra_data = extra_data or {}
 
@@ -447,6 +1146,7 @@ class EmailNotification(NotificationBase):
             headers=extra_data.get("headers", None),
             cc=extra_data.get("cc", None),
             reply_to=extra_data.get("reply_to", None),
+            connection=connection,
         )
 
         if html_content:
@@ -469,6 +1169,26 @@ class EmailNotification(NotificationBase):
         mail.send()
 
 
+class TwilioSendError(Exception):
+    """
+    Raised when a text message could not be sent to some of the recipients.
+    failures maps each of those recipients to its exception.
+    """
+
+    def __init__(self, failures, recipient_count):
+        self.failures = failures
+        super().__init__(
+            "Failed to send to {} of {} recipient(s): {}".format(
+                len(failures),
+                recipient_count,
+                "; ".join(
+                    "{}: {}".format(recipient, exc)
+                    for recipient, exc in failures.items()
+                ),
+            )
+        )
+
+
 class TwilioTextNotification(NotificationBase):
     """
     Base class for text notifications.
@@ -504,27 +1224,36 @@ class TwilioTextNotification(NotificationBase):
         extra_data=None,
         attachments=None,
     ):
-        try:
-            # twilio version 6
-            from twilio.rest import Client
-        except ImportError:
-            try:
-                # twillio version < 6
-                from twilio.rest import TwilioRestClient as Client
-            except ImportError:
-                raise Exception(
-                    "Twilio is required for sending a TwilioTextNotification."
-                )
+        client = get_twilio_client()
+        rate_limiter = get_twilio_rate_limiter()
+        concurrency = getattr(settings, "HERALD_TWILIO_CONCURRENCY", 1)
 
-        try:
-            account_sid = settings.TWILIO_ACCOUNT_SID
-            auth_token = settings.TWILIO_AUTH_TOKEN
-        except AttributeError:
-            raise Exception(
-                "TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN settings are required for sending a TwilioTextNotification"
-            )
-
-        client = Client(account_sid, auth_token)
-
-        for recipient in recipients:
+        def send_message(recipient):
+            if rate_limiter is not None:
+                rate_limiter.acquire()
             client.messages.create(body=text_content, to=recipient, from_=sent_from)
+
+        # every recipient is tried, so one failure does not keep the others from getting the message
+        failures = {}
+
+        if concurrency > 1 and len(recipients) > 1:
+            with ThreadPoolExecutor(
+                max_workers=min(concurrency, len(recipients))
+            ) as executor:
+                futures = [
+                    (recipient, executor.submit(send_message, recipient))
+                    for recipient in recipients
+                ]
+                for recipient, future in futures:
+                    exc = future.exception()
+                    if exc is not None:
+                        failures[recipient] = exc
+        else:
+            for recipient in recipients:
+                try:
+                    send_message(recipient)
+                except Exception as exc:  # pylint: disable=W0703
+                    failures[recipient] = exc
+
+        if failures:
+            raise TwilioSendError(failures, len(recipients))
@@ -0,0 +1,110 @@
+"""
+Deduplicated storage of rendered notification content
+"""
+
+import hashlib
+from datetime import timedelta
+
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .utils import get_sent_notification_model
+
+CONTENT_FIELDS = (("text_content", "text_body"), ("html_content", "html_body"))
+GRACE_PERIOD = timedelta(days=1)
+# last_used is only written again once it is this old, well within the grace period,
+# so sending the same content many times does not update its row on every send
+LAST_USED_INTERVAL = GRACE_PERIOD / 24
+
+
+def store_contents(sent_notifications):
+    """
+    Moves the content of unsaved sent notifications into StoredContent rows shared by identical content,
+    if HERALD_DEDUPLICATE_CONTENT is enabled. Missing contents are created in bulk.
+    """
+
+    if not getattr(settings, "HERALD_DEDUPLICATE_CONTENT", False):
+        return
+
+    StoredContent = django_apps.get_model("herald", "StoredContent")
+
+    contents = {}
+    refs = []
+
+    for sent_notification in sent_notifications:
+        for content_field, body_field in CONTENT_FIELDS:
+            content = getattr(sent_notification, content_field)
+            if not content:
+                continue
+
+            digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+            contents[digest] = content
+            refs.append((sent_notification, content_field, body_field, digest))
+
+    if not contents:
+        return
+
+    now = timezone.now()
+    # keeps content that is used again from being collected
+    StoredContent.objects.filter(
+        pk__in=contents, last_used__lt=now - LAST_USED_INTERVAL
+    ).update(last_used=now)
+    existing = set(
+        StoredContent.objects.filter(pk__in=contents).values_list("pk", flat=True)
+    )
+    StoredContent.objects.bulk_create(
+        [
+            StoredContent(digest=digest, content=content, last_used=now)
+            for digest, content in contents.items()
+            if digest not in existing
+        ],
+        ignore_conflicts=True,
+    )
+
+    # every sent notification shares one instance per content, so reading it back needs no query
+    bodies = {
+        digest: StoredContent(digest=digest, content=content, last_used=now)
+        for digest, content in contents.items()
+    }
+    for sent_notification, content_field, body_field, digest in refs:
+        setattr(sent_notification, body_field, bodies[digest])
+        setattr(sent_notification, content_field, None)
+
+
+def delete_unreferenced_contents(
+    grace_period=GRACE_PERIOD, batch_size=1000, max_batches=None
+):
+    """
+    Deletes stored contents no sent notification references any more.
+    Contents used within the grace period are kept, since their sent notification may not be saved yet.
+    At most max_batches batches are deleted, when it is given.
+    returns the number of contents deleted
+    """
+
+    StoredContent = django_apps.get_model("herald", "StoredContent")
+    SentNotification = get_sent_notification_model()
+
+    cutoff = timezone.now() - grace_period
+    unreferenced = StoredContent.objects.filter(last_used__lt=cutoff)
+    for _content_field, body_field in CONTENT_FIELDS:
+        unreferenced = unreferenced.filter(
+            ~Exists(SentNotification.objects.filter(**{body_field: OuterRef("pk")}))
+        )
+
+    deleted = 0
+    batches = 0
+
+    while max_batches is None or batches < max_batches:
+        batches += 1
+        digests = list(unreferenced.values_list("pk", flat=True)[:batch_size])
+
+        if not digests:
+            return deleted
+
+        # the conditions are checked again, since contents may have been used since they were selected
+        _total, counts = unreferenced.filter(pk__in=digests).delete()
+        deleted += counts.get(StoredContent._meta.label, 0)
+
+    return deleted
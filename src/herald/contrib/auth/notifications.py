@@ -96,7 +96,7 @@ class PasswordResetEmail(EmailNotification):
         if not subject:
             # subject was not defined on the class. Use the default subject template to get the subject.
             subject = loader.render_to_string(
-                self.subject_template_name, self.get_context_data()
+                self.subject_template_name, self.context_data
             )
             # can't have newlines
             return "".join(subject.splitlines())
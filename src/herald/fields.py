@@ -0,0 +1,156 @@
+"""
+Model fields for notifications app.
+"""
+
+import base64
+import zlib
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import models
+from django.db.models.query_utils import DeferredAttribute
+
+COMPRESSED_PREFIX = "\x1bherald:"
+
+
+def _get_codecs():
+    codecs = {"zlib": (zlib.compress, zlib.decompress)}
+
+    try:
+        # python 3.14+
+        from compression import zstd
+    except ImportError:
+        pass
+    else:
+        codecs["zstd"] = (zstd.compress, zstd.decompress)
+
+    return codecs
+
+
+CODECS = _get_codecs()
+CODEC_VERSION = 1
+
+
+def get_compression_codec():
+    """
+    Returns the codec name set by HERALD_COMPRESS_CONTENT, or None when compression is disabled
+    """
+
+    codec = getattr(settings, "HERALD_COMPRESS_CONTENT", False)
+
+    if not codec:
+        return None
+
+    if codec is True:
+        codec = "zlib"
+
+    if codec not in CODECS:
+        raise ImproperlyConfigured(
+            "HERALD_COMPRESS_CONTENT must be one of {}.".format(", ".join(CODECS))
+        )
+
+    return codec
+
+
+def compress(value, codec):
+    """
+    Returns the compressed value as text, prefixed with a marker that records the codec and its version
+    """
+
+    data = CODECS[codec][0](value.encode("utf-8"))
+
+    return "{}{}:{}:{}".format(
+        COMPRESSED_PREFIX, codec, CODEC_VERSION, base64.b64encode(data).decode("ascii")
+    )
+
+
+def decompress(value):
+    codec, _version, data = value[len(COMPRESSED_PREFIX) :].split(":", 2)
+
+    if codec not in CODECS:
+        raise ValueError(
+            "Content was compressed with unavailable codec {}.".format(codec)
+        )
+
+    return CODECS[codec][1](base64.b64decode(data)).decode("utf-8")
+
+
+def is_compressed(value):
+    return isinstance(value, str) and value.startswith(COMPRESSED_PREFIX)
+
+
+class StoredContentAttribute(DeferredAttribute):
+    """
+    Reads the content from the body the field's body_field references when the column itself is empty
+    """
+
+    def __get__(self, instance, cls=None):
+        if instance is None:
+            return self
+
+        value = super().__get__(instance, cls)
+
+        if value is None and self.field.body_field:
+            body_field = instance._meta.get_field(self.field.body_field)
+            if getattr(instance, body_field.attname) is not None:
+                return getattr(instance, body_field.name).content
+
+        return value
+
+    def __set__(self, instance, value):
+        # a data descriptor, so __get__ is called even when the column value is loaded
+        instance.__dict__[self.field.attname] = value
+
+
+class CompressedTextField(models.TextField):
+    """
+    A TextField that compresses values longer than HERALD_COMPRESS_CONTENT_MIN_LENGTH when saving,
+    if HERALD_COMPRESS_CONTENT is enabled. Compressed values are decompressed when loaded,
+    whatever the setting, so rows stay readable after compression is turned off.
+
+    body_field optionally names a foreign key to a StoredContent, which is read when the column is empty.
+    """
+
+    descriptor_class = StoredContentAttribute
+
+    def __init__(self, *args, body_field=None, **kwargs):
+        self.body_field = body_field
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.body_field:
+            kwargs["body_field"] = self.body_field
+        return name, path, args, kwargs
+
+    def from_db_value(self, value, expression, connection):
+        if is_compressed(value):
+            return decompress(value)
+        return value
+
+    def to_python(self, value):
+        if is_compressed(value):
+            return decompress(value)
+        return super().to_python(value)
+
+    def pre_save(self, model_instance, add):
+        if self.body_field:
+            # only the content kept in the column itself is saved, never the body's
+            return model_instance.__dict__.get(self.attname)
+        return super().pre_save(model_instance, add)
+
+    def get_db_prep_save(self, value, connection):
+        value = super().get_db_prep_save(value, connection)
+
+        codec = get_compression_codec()
+
+        if (
+            codec
+            and isinstance(value, str)
+            and not is_compressed(value)
+            and len(value)
+            >= getattr(settings, "HERALD_COMPRESS_CONTENT_MIN_LENGTH", 1024)
+        ):
+            return compress(value, codec)
+
+        return value
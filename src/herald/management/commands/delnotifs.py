@@ -1,15 +1,29 @@
 import datetime
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
 
-from ...utils import get_sent_notification_model
+from ...utils import delete_in_batches, get_sent_notification_model
 
 
 def valid_date(s):
     return datetime.datetime.strptime(s, "%Y-%m-%d")
 
 
+def valid_status(s):
+    """
+    Accepts a status number or name, e.g. "2", "failed" or "user_disabled"
+    """
+
+    SentNotification = get_sent_notification_model()
+
+    for value, label in SentNotification.STATUSES:
+        if str(s) == str(value) or str(s).lower().replace("_", " ") == label.lower():
+            return value
+
+    raise ValueError("invalid status: {}".format(s))
+
+
 class Command(BaseCommand):
     help = "Deletes notifications between the date ranges specified."
 
@@ -20,30 +34,87 @@ class Command(BaseCommand):
         parser.add_argument(
             "--end", help="up to this date, format YYYY-MM-DD", type=valid_date
         )
+        parser.add_argument(
+            "--older-than",
+            type=int,
+            help="only notifications sent more than this many days ago",
+        )
+        parser.add_argument(
+            "--status",
+            action="append",
+            help="only notifications with this status, by number or name (repeatable)",
+        )
+        parser.add_argument(
+            "--notification-class",
+            action="append",
+            help="only notifications of this class path (repeatable)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="number of notifications deleted per transaction",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="only report how many notifications would be deleted",
+        )
 
     def handle(self, *args, **options):
+        self.verbosity = options.get("verbosity", 1)
         SentNotification = get_sent_notification_model()
         start_date = options.get("start")
         end_date = options.get("end")
+        older_than = options.get("older_than")
+
+        qs = SentNotification.objects.all()
+        filtered = older_than is not None or any(
+            options.get(x) for x in ("start", "end", "status", "notification_class")
+        )
 
-        if not start_date and not end_date:
-            qs = SentNotification.objects.filter(date_sent__date=timezone.localdate())
-        else:
+        if not filtered:
+            # without any option only the notifications sent today are deleted
+            qs = qs.filter(date_sent__date=timezone.localdate())
+        elif start_date or end_date:
             today = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
             date_filters = {
                 "date_sent__lt": end_date or (today + datetime.timedelta(days=1))
             }
             if start_date:
                 date_filters["date_sent__gte"] = start_date
-            qs = SentNotification.objects.filter(**date_filters)
+            qs = qs.filter(**date_filters)
 
-        present_notifications = qs.count()
-        deleted_notifications = qs.delete()
-        deleted_num = (
-            deleted_notifications[0]
-            if deleted_notifications is not None
-            else present_notifications
+        if older_than is not None:
+            qs = qs.filter(
+                date_sent__lt=timezone.now() - datetime.timedelta(days=older_than)
+            )
+
+        if options.get("status"):
+            try:
+                statuses = [valid_status(x) for x in options["status"]]
+            except ValueError as exc:
+                raise CommandError(str(exc))
+            qs = qs.filter(status__in=statuses)
+
+        if options.get("notification_class"):
+            qs = qs.filter(notification_class__in=options["notification_class"])
+
+        if options.get("dry_run"):
+            self.stdout.write(
+                "Would delete {num} notification(s)".format(num=qs.count())
+            )
+            return
+
+        deleted_num = delete_in_batches(
+            qs, batch_size=options.get("batch_size") or 1000, progress=self.progress
         )
         self.stdout.write(
             "Successfully deleted {num} notification(s)".format(num=deleted_num)
         )
+
+    def progress(self, deleted_num):
+        if self.verbosity > 1:
+            self.stdout.write(
+                "Deleted {num} notification(s) so far".format(num=deleted_num)
+            )
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ...utils import delete_expired_notifications
+
+
+class Command(BaseCommand):
+    help = "Deletes notifications older than the HERALD_NOTIFICATION_RETENTION_TIME setting."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            help="number of notifications deleted per query",
+        )
+
+    def handle(self, *args, **options):
+        if not getattr(settings, "HERALD_NOTIFICATION_RETENTION_TIME", None):
+            raise CommandError("HERALD_NOTIFICATION_RETENTION_TIME is not set.")
+
+        deleted_num = delete_expired_notifications(batch_size=options["batch_size"])
+
+        self.stdout.write(
+            "Successfully deleted {num} expired notification(s)".format(num=deleted_num)
+        )
@@ -0,0 +1,78 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import ExpressionWrapper, F, TextField
+
+from ...fields import get_compression_codec, is_compressed
+from ...utils import get_sent_notification_model
+
+CONTENT_FIELDS = ("text_content", "html_content")
+
+
+class Command(BaseCommand):
+    help = "Compresses the stored content of notifications saved before HERALD_COMPRESS_CONTENT was enabled."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="number of notifications read and updated per query",
+        )
+
+    def handle(self, *args, **options):
+        if not get_compression_codec():
+            raise CommandError("HERALD_COMPRESS_CONTENT is not enabled.")
+
+        self.verbosity = options["verbosity"]
+        SentNotification = get_sent_notification_model()
+        min_length = getattr(settings, "HERALD_COMPRESS_CONTENT_MIN_LENGTH", 1024)
+        batch_size = options["batch_size"]
+        compressed_num = 0
+        last_pk = None
+
+        while True:
+            qs = SentNotification.objects.order_by("pk")
+            if last_pk is not None:
+                qs = qs.filter(pk__gt=last_pk)
+
+            # read the raw column values, so rows that are already compressed can be skipped
+            rows = list(
+                qs.values_list(
+                    "pk",
+                    *(
+                        ExpressionWrapper(F(name), output_field=TextField())
+                        for name in CONTENT_FIELDS
+                    ),
+                )[:batch_size]
+            )
+
+            if not rows:
+                break
+
+            last_pk = rows[-1][0]
+
+            updates = []
+            for pk, *values in rows:
+                if any(
+                    value is not None
+                    and not is_compressed(value)
+                    and len(value) >= min_length
+                    for value in values
+                ):
+                    updates.append(
+                        SentNotification(pk=pk, **dict(zip(CONTENT_FIELDS, values)))
+                    )
+
+            if updates:
+                # the content fields compress the values when they are saved
+                SentNotification.objects.bulk_update(updates, CONTENT_FIELDS)
+                compressed_num += len(updates)
+
+            if self.verbosity > 1:
+                self.stdout.write(
+                    "Compressed {num} notification(s) so far".format(num=compressed_num)
+                )
+
+        self.stdout.write(
+            "Successfully compressed {num} notification(s)".format(num=compressed_num)
+        )
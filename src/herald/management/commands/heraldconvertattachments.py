@@ -0,0 +1,80 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from ...attachments import decode_attachments, encode_attachments
+from ...utils import get_sent_notification_model
+
+
+class Command(BaseCommand):
+    help = "Converts the attachments of notifications saved with jsonpickle to the encoded attachments format."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="number of notifications read and updated per query",
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options["verbosity"]
+        SentNotification = get_sent_notification_model()
+        batch_size = options["batch_size"]
+        converted_num = 0
+        failed_num = 0
+        last_pk = None
+
+        qs = (
+            SentNotification.objects.filter(attachments__isnull=False)
+            .exclude(
+                Q(attachments="")
+                | Q(attachments__startswith='{"encoded_attachments"')
+                | Q(attachments__startswith='{"stored_attachments"')
+            )
+            .order_by("pk")
+            .only("pk", "attachments")
+        )
+
+        while True:
+            remaining = qs if last_pk is None else qs.filter(pk__gt=last_pk)
+            rows = list(remaining[:batch_size])
+
+            if not rows:
+                break
+
+            last_pk = rows[-1].pk
+
+            updates = []
+            for row in rows:
+                try:
+                    row.attachments = encode_attachments(
+                        decode_attachments(row.attachments)
+                    )
+                except Exception as exc:  # pylint: disable=W0703
+                    # leave the row as it is, it can still be read with jsonpickle
+                    failed_num += 1
+                    self.stderr.write(
+                        "Could not convert the attachments of notification {pk}: {exc}".format(
+                            pk=row.pk, exc=exc
+                        )
+                    )
+                else:
+                    updates.append(row)
+
+            if updates:
+                SentNotification.objects.bulk_update(updates, ["attachments"])
+                converted_num += len(updates)
+
+            if self.verbosity > 1:
+                self.stdout.write(
+                    "Converted {num} notification(s) so far".format(num=converted_num)
+                )
+
+        self.stdout.write(
+            "Successfully converted {num} notification(s)".format(num=converted_num)
+        )
+
+        if failed_num:
+            self.stdout.write(
+                "Failed to convert {num} notification(s)".format(num=failed_num)
+            )
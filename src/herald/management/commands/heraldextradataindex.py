@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, router
+
+from ...utils import get_sent_notification_model
+
+INDEX_NAME = "{}_extra_data_gin"
+
+
+class Command(BaseCommand):
+    help = (
+        "Creates a GIN index on the extra data of sent notifications on PostgreSQL, "
+        "without locking the table for writes, or drops it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--drop",
+            action="store_true",
+            default=False,
+            help="drop the index instead of creating it",
+        )
+
+    def handle(self, *args, **options):
+        SentNotification = get_sent_notification_model()
+        connection = connections[router.db_for_write(SentNotification)]
+
+        # only postgresql indexes jsonb containment lookups
+        if connection.vendor != "postgresql":
+            raise CommandError("The extra data index is only supported on PostgreSQL.")
+
+        qn = connection.ops.quote_name
+        index_name = qn(INDEX_NAME.format(SentNotification._meta.db_table))
+
+        if options["drop"]:
+            statement = "DROP INDEX CONCURRENTLY IF EXISTS {}".format(index_name)
+        else:
+            statement = "CREATE INDEX CONCURRENTLY IF NOT EXISTS {} ON {} USING GIN ({} jsonb_path_ops)".format(
+                index_name,
+                qn(SentNotification._meta.db_table),
+                qn(SentNotification._meta.get_field("extra_data").column),
+            )
+
+        with connection.cursor() as cursor:
+            cursor.execute(statement)
+
+        if options["drop"]:
+            self.stdout.write("Successfully dropped the extra data index")
+        else:
+            self.stdout.write("Successfully created the extra data index")
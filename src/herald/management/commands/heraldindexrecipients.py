@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ...recipients import link_recipients
+from ...utils import get_sent_notification_model
+
+
+class Command(BaseCommand):
+    help = "Records the normalized recipients of notifications saved before they were indexed."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="number of notifications read and indexed per batch",
+        )
+
+    def handle(self, *args, **options):
+        if not getattr(settings, "HERALD_INDEX_RECIPIENTS", True):
+            raise CommandError("HERALD_INDEX_RECIPIENTS is disabled.")
+
+        self.verbosity = options["verbosity"]
+        SentNotification = get_sent_notification_model()
+        batch_size = options["batch_size"]
+        indexed_num = 0
+        last_pk = None
+
+        qs = SentNotification.objects.order_by("pk").only("pk", "recipients")
+
+        while True:
+            remaining = qs if last_pk is None else qs.filter(pk__gt=last_pk)
+            rows = list(remaining[:batch_size])
+
+            if not rows:
+                break
+
+            last_pk = rows[-1].pk
+
+            # recipients that are already recorded are skipped by the database
+            link_recipients(rows)
+            indexed_num += len(rows)
+
+            if self.verbosity > 1:
+                self.stdout.write(
+                    "Indexed {num} notification(s) so far".format(num=indexed_num)
+                )
+
+        self.stdout.write(
+            "Successfully indexed the recipients of {num} notification(s)".format(
+                num=indexed_num
+            )
+        )
@@ -0,0 +1,109 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from ...utils import (
+    get_sent_notification_model,
+    queue_notifications,
+    resend_notifications,
+)
+from .delnotifs import valid_date, valid_status
+
+
+class Command(BaseCommand):
+    help = "Resends sent notifications, by default the failed ones, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--start", help="includes this date, format YYYY-MM-DD", type=valid_date
+        )
+        parser.add_argument(
+            "--end", help="up to this date, format YYYY-MM-DD", type=valid_date
+        )
+        parser.add_argument(
+            "--newer-than",
+            type=int,
+            help="only notifications sent less than this many days ago",
+        )
+        parser.add_argument(
+            "--status",
+            action="append",
+            help="only notifications with this status, by number or name (repeatable, defaults to failed)",
+        )
+        parser.add_argument(
+            "--notification-class",
+            action="append",
+            help="only notifications of this class path (repeatable)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="number of notifications resent per batch over one connection",
+        )
+        parser.add_argument(
+            "--queue",
+            action="store_true",
+            help="queue the notifications for the heraldworker command instead of sending them",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="only report how many notifications would be resent",
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options.get("verbosity", 1)
+        SentNotification = get_sent_notification_model()
+
+        try:
+            statuses = [valid_status(x) for x in options.get("status") or ["failed"]]
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        qs = SentNotification.objects.filter(status__in=statuses)
+
+        if options.get("start"):
+            qs = qs.filter(date_sent__gte=options["start"])
+
+        if options.get("end"):
+            qs = qs.filter(date_sent__lt=options["end"])
+
+        if options.get("newer_than") is not None:
+            qs = qs.filter(
+                date_sent__gte=timezone.now()
+                - datetime.timedelta(days=options["newer_than"])
+            )
+
+        if options.get("notification_class"):
+            qs = qs.filter(notification_class__in=options["notification_class"])
+
+        if options.get("dry_run"):
+            self.stdout.write(
+                "Would resend {num} notification(s)".format(num=qs.count())
+            )
+            return
+
+        if options.get("queue"):
+            self.stdout.write(
+                "Successfully queued {num} notification(s)".format(
+                    num=queue_notifications(qs)
+                )
+            )
+            return
+
+        resent_num, total_num = resend_notifications(
+            qs, batch_size=options.get("batch_size") or 100, progress=self.progress
+        )
+        self.stdout.write(
+            "Successfully resent {resent} of {total} notification(s)".format(
+                resent=resent_num, total=total_num
+            )
+        )
+
+    def progress(self, total_num):
+        if self.verbosity > 1:
+            self.stdout.write(
+                "Resent {num} notification(s) so far".format(num=total_num)
+            )
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, router
+
+from ...search import get_search_backend
+from ...utils import get_sent_notification_model
+
+
+class Command(BaseCommand):
+    help = "Creates the index of the search backend set by HERALD_SEARCH_BACKEND, or drops it."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--drop",
+            action="store_true",
+            default=False,
+            help="drop the index instead of creating it",
+        )
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+
+        if backend is None:
+            raise CommandError("HERALD_SEARCH_BACKEND is not set.")
+
+        SentNotification = get_sent_notification_model()
+        connection = connections[router.db_for_write(SentNotification)]
+
+        if backend.vendor != connection.vendor:
+            raise CommandError(
+                "{} only supports {} databases.".format(
+                    type(backend).__name__, backend.vendor
+                )
+            )
+
+        if options["drop"]:
+            backend.drop_index(SentNotification, connection)
+            self.stdout.write("Successfully dropped the search index")
+        else:
+            backend.create_index(SentNotification, connection)
+            self.stdout.write("Successfully created the search index")
@@ -0,0 +1,103 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from ...base import NotificationBase
+from ...utils import get_sent_notification_model, resend_sent_notifications
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Sends notifications that were queued with send(deferred=True)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="number of queued notifications claimed and sent per batch",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=5,
+            help="seconds to wait before polling again when the queue is empty",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="exit once the queue is empty instead of polling",
+        )
+        parser.add_argument(
+            "--lease",
+            type=int,
+            default=600,
+            help="seconds after which notifications claimed by a worker that did not finish sending them are claimed again",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        lease = timedelta(seconds=options["lease"])
+        total = 0
+
+        while True:
+            try:
+                sent = self.process_batch(batch_size, lease)
+            except Exception:
+                # the claimed notifications are sent again once their lease expires
+                logger.exception("Failed to send a batch of queued notifications.")
+                time.sleep(options["sleep"])
+                continue
+
+            total += sent
+
+            if not sent:
+                if options["once"]:
+                    break
+                time.sleep(options["sleep"])
+
+        self.stdout.write("Sent {num} queued notification(s)".format(num=total))
+
+    def process_batch(self, batch_size, lease=timedelta(minutes=10)):
+        """
+        Claims a batch of queued notifications, and of notifications whose claim expired, and sends them.
+        Rows locked by other workers are skipped, so many workers can run at once.
+        returns the number of notifications processed
+        """
+
+        SentNotification = get_sent_notification_model()
+        now = timezone.now()
+
+        with transaction.atomic():
+            claimed = list(
+                SentNotification.objects.select_for_update(skip_locked=True)
+                .filter(
+                    Q(status=SentNotification.STATUS_QUEUED)
+                    | Q(
+                        status=SentNotification.STATUS_PENDING,
+                        claimed_at__lt=now - lease,
+                    )
+                )
+                .order_by("date_sent", "pk")
+                .prefetch_related("text_body", "html_body")[:batch_size]
+            )
+
+            if not claimed:
+                return 0
+
+            # mark the rows as in flight so they are not claimed again once the lock is released
+            SentNotification.objects.filter(pk__in=[x.pk for x in claimed]).update(
+                status=SentNotification.STATUS_PENDING, claimed_at=now
+            )
+
+        resend_sent_notifications(claimed)
+
+        NotificationBase._delete_expired_notifications()
+
+        return len(claimed)
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("herald", "0005_auto_20180516_1755"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="sentnotification",
+            name="status",
+            field=models.PositiveSmallIntegerField(
+                choices=[
+                    (0, "Pending"),
+                    (1, "Success"),
+                    (2, "Failed"),
+                    (3, "User Disabled"),
+                    (4, "Queued"),
+                ],
+                default=0,
+            ),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("herald", "0006_sentnotification_status_queued"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="sentnotification",
+            index=models.Index(
+                fields=["date_sent"], name="herald_sent_date_se_1ee889_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="sentnotification",
+            index=models.Index(
+                fields=["status", "date_sent"], name="herald_sent_status_c32a80_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="sentnotification",
+            index=models.Index(
+                fields=["notification_class", "date_sent"],
+                name="herald_sent_notific_2a61de_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="sentnotification",
+            index=models.Index(
+                fields=["user", "date_sent"], name="herald_sent_user_id_3addee_idx"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="sentnotification",
+            name="user",
+            field=models.ForeignKey(
+                db_index=False,
+                default=None,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+    ]
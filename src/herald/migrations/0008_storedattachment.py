@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("herald", "0007_sentnotification_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StoredAttachment",
+            fields=[
+                (
+                    "digest",
+                    models.CharField(max_length=64, primary_key=True, serialize=False),
+                ),
+                ("size", models.PositiveBigIntegerField()),
+                ("last_used", models.DateTimeField(db_index=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="sentnotification",
+            name="stored_attachments",
+            field=models.ManyToManyField(
+                blank=True,
+                editable=False,
+                related_name="+",
+                to="herald.storedattachment",
+            ),
+        ),
+    ]
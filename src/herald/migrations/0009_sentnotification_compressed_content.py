@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:10
+
+import herald.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("herald", "0008_storedattachment"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="sentnotification",
+            name="html_content",
+            field=herald.fields.CompressedTextField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="sentnotification",
+            name="text_content",
+            field=herald.fields.CompressedTextField(blank=True, null=True),
+        ),
+    ]
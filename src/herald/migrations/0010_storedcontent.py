@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:16
+
+import django.db.models.deletion
+import herald.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("herald", "0009_sentnotification_compressed_content"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StoredContent",
+            fields=[
+                (
+                    "digest",
+                    models.CharField(max_length=64, primary_key=True, serialize=False),
+                ),
+                ("content", herald.fields.CompressedTextField()),
+                ("last_used", models.DateTimeField(db_index=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name="sentnotification",
+            name="html_content",
+            field=herald.fields.CompressedTextField(
+                blank=True, body_field="html_body", null=True
+            ),
+        ),
+        migrations.AlterField(
+            model_name="sentnotification",
+            name="text_content",
+            field=herald.fields.CompressedTextField(
+                blank=True, body_field="text_body", null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="sentnotification",
+            name="html_body",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="herald.storedcontent",
+            ),
+        ),
+        migrations.AddField(
+            model_name="sentnotification",
+            name="text_body",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="herald.storedcontent",
+            ),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("herald", "0010_storedcontent"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="sentnotification",
+            name="content_stored",
+            field=models.BooleanField(default=True),
+        ),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("herald", "0011_sentnotification_content_stored"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="sentnotification",
+            name="extra_data_json",
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
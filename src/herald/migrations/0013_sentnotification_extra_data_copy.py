@@ -0,0 +1,73 @@
+import json
+
+from django.db import migrations, transaction
+
+BATCH_SIZE = 1000
+
+
+def copy_in_batches(apps, schema_editor, source, target, convert):
+    """
+    Copies the extra data from the source field to the target field in primary key batches,
+    each in its own transaction, so the table is not locked for the whole copy
+    """
+
+    SentNotification = apps.get_model("herald", "SentNotification")
+    db = schema_editor.connection.alias
+    qs = (
+        SentNotification.objects.using(db)
+        .filter(**{"{}__isnull".format(source): False})
+        .order_by("pk")
+    )
+    last_pk = None
+
+    while True:
+        remaining = qs if last_pk is None else qs.filter(pk__gt=last_pk)
+        rows = list(remaining.values_list("pk", source)[:BATCH_SIZE])
+
+        if not rows:
+            return
+
+        last_pk = rows[-1][0]
+
+        with transaction.atomic(using=db):
+            SentNotification.objects.using(db).bulk_update(
+                [
+                    SentNotification(pk=pk, **{target: convert(value)})
+                    for pk, value in rows
+                ],
+                [target],
+            )
+
+
+def parse(value):
+    try:
+        value = json.loads(value)
+    except ValueError:
+        # not json, kept wrapped so get_extra_data still returns a dictionary
+        return {"value": value}
+
+    if value and not isinstance(value, dict):
+        return {"value": value}
+
+    return value or None
+
+
+def copy_to_json(apps, schema_editor):
+    copy_in_batches(apps, schema_editor, "extra_data", "extra_data_json", parse)
+
+
+def copy_to_text(apps, schema_editor):
+    copy_in_batches(apps, schema_editor, "extra_data_json", "extra_data", json.dumps)
+
+
+class Migration(migrations.Migration):
+    # every batch is committed on its own
+    atomic = False
+
+    dependencies = [
+        ("herald", "0012_sentnotification_extra_data_json"),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_to_json, copy_to_text, elidable=True),
+    ]
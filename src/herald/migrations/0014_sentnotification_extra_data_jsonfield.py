@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("herald", "0013_sentnotification_extra_data_copy"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="sentnotification",
+            name="extra_data",
+        ),
+        migrations.RenameField(
+            model_name="sentnotification",
+            old_name="extra_data_json",
+            new_name="extra_data",
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("herald", "0014_sentnotification_extra_data_jsonfield"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Recipient",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("address", models.CharField(max_length=255, unique=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name="sentnotification",
+            name="recipients",
+            field=models.TextField(),
+        ),
+        migrations.AddField(
+            model_name="sentnotification",
+            name="recipient_addresses",
+            field=models.ManyToManyField(
+                blank=True, editable=False, related_name="+", to="herald.recipient"
+            ),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("herald", "0016_sentnotification_status_suppressed"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="sentnotification",
+            name="claimed_at",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
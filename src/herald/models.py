@@ -4,10 +4,32 @@ Models for notifications app.
 
 import json
 
-import jsonpickle
 from django.conf import settings
 from django.db import models
-from django.utils.module_loading import import_string
+
+from .attachments import decode_attachments
+from .fields import CompressedTextField
+from .recipients import normalize_recipient
+from .utils import get_notification_class
+
+
+class SentNotificationQuerySet(models.QuerySet):
+    def sent_to(self, *recipients):
+        """
+        Returns the sent notifications sent to any of the recipients, looked up through their normalized addresses
+        """
+
+        notifications = self.filter(
+            recipient_addresses__address__in=[
+                normalize_recipient(x) for x in recipients
+            ]
+        )
+
+        if len(recipients) > 1:
+            # a notification sent to several of the recipients is matched once per recipient
+            notifications = notifications.distinct()
+
+        return notifications
 
 
 class SentNotificationAbstract(models.Model):
@@ -19,29 +41,100 @@ class SentNotificationAbstract(models.Model):
     STATUS_SUCCESS = 1
     STATUS_FAILED = 2
     STATUS_USER_DISABLED = 3
+    STATUS_QUEUED = 4
+    STATUS_SUPPRESSED = 5
 
-    STATUSES = ((0, "Pending"), (1, "Success"), (2, "Failed"), (3, "User Disabled"))
+    STATUSES = (
+        (0, "Pending"),
+        (1, "Success"),
+        (2, "Failed"),
+        (3, "User Disabled"),
+        (4, "Queued"),
+        (5, "Suppressed"),
+    )
 
-    text_content = models.TextField(null=True, blank=True)
-    html_content = models.TextField(null=True, blank=True)
+    text_content = CompressedTextField(null=True, blank=True, body_field="text_body")
+    html_content = CompressedTextField(null=True, blank=True, body_field="html_body")
+    text_body = models.ForeignKey(
+        "herald.StoredContent",
+        null=True,
+        blank=True,
+        editable=False,
+        on_delete=models.PROTECT,
+        related_name="+",
+    )  # deduplicated text content, when HERALD_DEDUPLICATE_CONTENT is enabled
+    html_body = models.ForeignKey(
+        "herald.StoredContent",
+        null=True,
+        blank=True,
+        editable=False,
+        on_delete=models.PROTECT,
+        related_name="+",
+    )  # deduplicated html content, when HERALD_DEDUPLICATE_CONTENT is enabled
     sent_from = models.CharField(max_length=100, null=True, blank=True)
-    recipients = models.CharField(
-        max_length=2000
-    )  # Comma separated list of emails or numbers
+    recipients = models.TextField()  # Comma separated list of emails or numbers
+    recipient_addresses = models.ManyToManyField(
+        "herald.Recipient", blank=True, editable=False, related_name="+"
+    )  # normalized recipients, for looking up the notifications sent to one recipient
     subject = models.CharField(max_length=255, null=True, blank=True)
-    extra_data = models.TextField(null=True, blank=True)  # json dictionary
+    extra_data = models.JSONField(null=True, blank=True)
     date_sent = models.DateTimeField()
     status = models.PositiveSmallIntegerField(choices=STATUSES, default=STATUS_PENDING)
+    claimed_at = models.DateTimeField(
+        null=True, blank=True, editable=False
+    )  # when heraldworker claimed the notification, so the claim of a crashed worker expires
     notification_class = models.CharField(max_length=255)
     error_message = models.TextField(null=True, blank=True)
     user = models.ForeignKey(
-        settings.AUTH_USER_MODEL, default=None, null=True, on_delete=models.SET_NULL
-    )
+        settings.AUTH_USER_MODEL,
+        default=None,
+        null=True,
+        on_delete=models.SET_NULL,
+        db_index=False,
+    )  # indexed by the (user, date_sent) index, which also serves lookups by user only
     attachments = models.TextField(null=True, blank=True)
+    stored_attachments = models.ManyToManyField(
+        "herald.StoredAttachment", blank=True, editable=False, related_name="+"
+    )  # attachments kept in HERALD_ATTACHMENT_STORAGE that this notification references
+    content_stored = models.BooleanField(
+        default=True
+    )  # False when the content policy only kept the metadata
+
+    objects = SentNotificationQuerySet.as_manager()
+
+    CONTENT_FIELDS = (
+        "text_content",
+        "html_content",
+        "text_body",
+        "html_body",
+        "attachments",
+        "content_stored",
+    )
 
     def __str__(self):
         return self.notification_class
 
+    def clear_content(self):
+        """
+        Drops the rendered content and attachments, keeping only the metadata of the notification
+        """
+
+        self.text_content = None
+        self.html_content = None
+        self.text_body = None
+        self.html_body = None
+        self.attachments = None
+        self.content_stored = False
+
+    def has_content(self):
+        """
+        Returns whether the content is stored, or at least loaded on this instance
+        """
+
+        return self.content_stored or any(
+            x is not None for x in (self.text_content, self.html_content)
+        )
+
     def get_recipients(self):
         """
         Return the list of recipients for the notification. Recipient is defined by the notification class.
@@ -54,7 +147,7 @@ class SentNotificationAbstract(models.Model):
         Re-sends the notification by calling the notification class' resend method
         """
 
-        notification_class = import_string(self.notification_class)
+        notification_class = get_notification_class(self.notification_class)
         return notification_class.resend(self)
 
     def get_extra_data(self):
@@ -64,17 +157,34 @@ class SentNotificationAbstract(models.Model):
 
         if not self.extra_data:
             return {}
-        else:
+        elif isinstance(self.extra_data, str):
+            # json text assigned by code written for the former text column
             return json.loads(self.extra_data)
+        else:
+            return self.extra_data
 
     def get_attachments(self):
-        if self.attachments:
-            return jsonpickle.loads(self.attachments)
-        else:
+        """
+        Return the attachments, reading stored attachments from HERALD_ATTACHMENT_STORAGE when they are accessed
+        """
+
+        if not self.attachments:
             return None
 
+        return decode_attachments(self.attachments)
+
     class Meta:
         abstract = True
+        indexes = [
+            # retention cleanup, delnotifs and the admin date_hierarchy
+            models.Index(fields=["date_sent"]),
+            # admin list_filter and delnotifs --status
+            models.Index(fields=["status", "date_sent"]),
+            # admin list_filter and delnotifs --notification-class
+            models.Index(fields=["notification_class", "date_sent"]),
+            # per-user history
+            models.Index(fields=["user", "date_sent"]),
+        ]
 
 
 class SentNotification(SentNotificationAbstract):
@@ -82,6 +192,43 @@ class SentNotification(SentNotificationAbstract):
         abstract = False
 
 
+class StoredAttachment(models.Model):
+    """
+    Attachment content kept once in HERALD_ATTACHMENT_STORAGE, keyed by its sha256.
+    """
+
+    digest = models.CharField(max_length=64, primary_key=True)
+    size = models.PositiveBigIntegerField()
+    last_used = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.digest
+
+
+class Recipient(models.Model):
+    """
+    A normalized recipient address, shared by every sent notification sent to it.
+    """
+
+    address = models.CharField(max_length=255, unique=True)
+
+    def __str__(self):
+        return self.address
+
+
+class StoredContent(models.Model):
+    """
+    Rendered content shared by every sent notification with the same content, keyed by its sha256.
+    """
+
+    digest = models.CharField(max_length=64, primary_key=True)
+    content = CompressedTextField()
+    last_used = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.digest
+
+
 class Notification(models.Model):
     """
     NotificationClasses are created on app init.
@@ -0,0 +1,79 @@
+"""
+Normalized recipients of sent notifications, for looking up the history of one recipient
+"""
+
+from email.utils import parseaddr
+
+from django.apps import apps as django_apps
+from django.conf import settings
+
+from .utils import get_sent_notification_model
+
+
+def normalize_recipient(recipient):
+    """
+    Returns the address a recipient is indexed under: the email address of "Name <address>" recipients,
+    stripped and lower cased. Phone numbers and other recipients are only stripped and lower cased.
+    """
+
+    recipient = recipient.strip()
+
+    if "<" in recipient:
+        recipient = parseaddr(recipient)[1] or recipient
+
+    return recipient.lower()
+
+
+def link_recipients(sent_notifications):
+    """
+    Records the normalized recipients of saved sent notifications, with a few bulk queries for the whole batch,
+    unless HERALD_INDEX_RECIPIENTS is disabled
+    """
+
+    if not getattr(settings, "HERALD_INDEX_RECIPIENTS", True):
+        return
+
+    Recipient = django_apps.get_model("herald", "Recipient")
+    SentNotification = get_sent_notification_model()
+    field = SentNotification._meta.get_field("recipient_addresses")
+    through = field.remote_field.through
+
+    max_length = Recipient._meta.get_field("address").max_length
+    addresses = {
+        sent_notification.pk: {
+            address
+            for address in map(normalize_recipient, sent_notification.get_recipients())
+            # longer values are not addresses anyone looks up
+            if address and len(address) <= max_length
+        }
+        for sent_notification in sent_notifications
+        if sent_notification.recipients
+    }
+    all_addresses = set().union(*addresses.values())
+
+    if not all_addresses:
+        return
+
+    Recipient.objects.bulk_create(
+        [Recipient(address=address) for address in all_addresses],
+        ignore_conflicts=True,
+    )
+    recipient_ids = dict(
+        Recipient.objects.filter(address__in=all_addresses).values_list("address", "pk")
+    )
+
+    through.objects.bulk_create(
+        [
+            through(
+                **{
+                    "{}_id".format(field.m2m_field_name()): pk,
+                    "{}_id".format(field.m2m_reverse_field_name()): recipient_ids[
+                        address
+                    ],
+                }
+            )
+            for pk, pk_addresses in addresses.items()
+            for address in pk_addresses
+        ],
+        ignore_conflicts=True,
+    )
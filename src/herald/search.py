@@ -0,0 +1,276 @@
+"""
+Search backends for finding sent notifications in the admin without scanning the whole table
+"""
+
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+SEARCH_FIELDS = ("recipients", "subject", "text_content", "html_content", "sent_from")
+
+
+def get_search_backend():
+    """
+    Returns the search backend set by HERALD_SEARCH_BACKEND, or None to use the admin's default search
+    """
+
+    path = getattr(settings, "HERALD_SEARCH_BACKEND", None)
+
+    if not path:
+        return None
+
+    return _get_search_backend(path)
+
+
+@lru_cache(maxsize=None)
+def _get_search_backend(path):
+    return import_string(path)()
+
+
+class SearchBackend:
+    """
+    Base class for search backends.
+    A backend filters a queryset of sent notifications by a search term, using an index it creates itself.
+    The index is kept up to date by the database, so it also covers bulk inserts and updates.
+    """
+
+    vendor = None
+    fields = SEARCH_FIELDS
+
+    def search(self, queryset, search_term):
+        """
+        Returns the queryset filtered to the sent notifications matching every word of the search term
+        """
+
+        raise NotImplementedError("Must implement search.")
+
+    def create_index(self, model, connection):
+        """
+        Creates the index for the model, and fills it for the existing rows
+        """
+
+        raise NotImplementedError("Must implement create_index.")
+
+    def drop_index(self, model, connection):
+        raise NotImplementedError("Must implement drop_index.")
+
+    def get_columns(self, model, connection):
+        """
+        Returns the quoted and table qualified columns of the searched fields
+        """
+
+        qn = connection.ops.quote_name
+        return [
+            "{}.{}".format(
+                qn(model._meta.db_table), qn(model._meta.get_field(name).column)
+            )
+            for name in self.fields
+        ]
+
+    def execute(self, connection, statements):
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+
+
+class PostgresSearchBackend(SearchBackend):
+    """
+    Full text search on PostgreSQL, with a GIN index on the tsvector of the searched fields
+    """
+
+    vendor = "postgresql"
+    config = "simple"
+
+    def get_index_name(self, model):
+        return "{}_search".format(model._meta.db_table)
+
+    def get_vector_sql(self, model, connection):
+        # the search must use the exact expression of the index for the index to be used
+        return "to_tsvector('{}'::regconfig, {})".format(
+            self.config,
+            " || ' ' || ".join(
+                "coalesce({}, '')".format(column)
+                for column in self.get_columns(model, connection)
+            ),
+        )
+
+    def search(self, queryset, search_term):
+        connection = connections[queryset.db]
+
+        return queryset.filter(
+            RawSQL(
+                "{} @@ plainto_tsquery('{}'::regconfig, %s)".format(
+                    self.get_vector_sql(queryset.model, connection), self.config
+                ),
+                (search_term,),
+                output_field=BooleanField(),
+            )
+        )
+
+    def create_index(self, model, connection):
+        qn = connection.ops.quote_name
+        self.execute(
+            connection,
+            [
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS {} ON {} USING GIN ({})".format(
+                    qn(self.get_index_name(model)),
+                    qn(model._meta.db_table),
+                    self.get_vector_sql(model, connection),
+                )
+            ],
+        )
+
+    def drop_index(self, model, connection):
+        self.execute(
+            connection,
+            [
+                "DROP INDEX CONCURRENTLY IF EXISTS {}".format(
+                    connection.ops.quote_name(self.get_index_name(model))
+                )
+            ],
+        )
+
+
+class PostgresTrigramSearchBackend(SearchBackend):
+    """
+    Substring search on PostgreSQL, like the admin's default search, with a pg_trgm GIN index on each searched field
+    """
+
+    vendor = "postgresql"
+
+    def get_index_name(self, model, field_name):
+        return "{}_{}_trgm".format(model._meta.db_table, field_name)
+
+    def search(self, queryset, search_term):
+        connection = connections[queryset.db]
+        columns = self.get_columns(queryset.model, connection)
+
+        for word in search_term.split():
+            pattern = "%{}%".format(connection.ops.prep_for_like_query(word))
+            queryset = queryset.filter(
+                RawSQL(
+                    "({})".format(
+                        " OR ".join("{} ILIKE %s".format(column) for column in columns)
+                    ),
+                    (pattern,) * len(columns),
+                    output_field=BooleanField(),
+                )
+            )
+
+        return queryset
+
+    def create_index(self, model, connection):
+        qn = connection.ops.quote_name
+        self.execute(
+            connection,
+            ["CREATE EXTENSION IF NOT EXISTS pg_trgm"]
+            + [
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS {} ON {} USING GIN ({} gin_trgm_ops)".format(
+                    qn(self.get_index_name(model, name)),
+                    qn(model._meta.db_table),
+                    qn(model._meta.get_field(name).column),
+                )
+                for name in self.fields
+            ],
+        )
+
+    def drop_index(self, model, connection):
+        self.execute(
+            connection,
+            [
+                "DROP INDEX CONCURRENTLY IF EXISTS {}".format(
+                    connection.ops.quote_name(self.get_index_name(model, name))
+                )
+                for name in self.fields
+            ],
+        )
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """
+    Full text search on SQLite, with an FTS5 table over the searched fields that triggers keep in sync
+    """
+
+    vendor = "sqlite"
+
+    def get_table_name(self, model):
+        return "{}_fts".format(model._meta.db_table)
+
+    def get_match_query(self, search_term):
+        # every word is quoted, so FTS5 operators in the term are searched for literally,
+        # and matched as a prefix
+        return " ".join(
+            '"{}"*'.format(word.replace('"', '""')) for word in search_term.split()
+        )
+
+    def search(self, queryset, search_term):
+        if not search_term.split():
+            return queryset
+
+        qn = connections[queryset.db].ops.quote_name
+        fts_table = qn(self.get_table_name(queryset.model))
+
+        return queryset.filter(
+            pk__in=RawSQL(
+                "SELECT rowid FROM {} WHERE {} MATCH %s".format(fts_table, fts_table),
+                (self.get_match_query(search_term),),
+            )
+        )
+
+    def create_index(self, model, connection):
+        qn = connection.ops.quote_name
+        table = qn(model._meta.db_table)
+        fts_table = qn(self.get_table_name(model))
+        pk = qn(model._meta.pk.column)
+        columns = [qn(model._meta.get_field(name).column) for name in self.fields]
+
+        def values(prefix):
+            return ", ".join(
+                ["{}.{}".format(prefix, pk)]
+                + ["{}.{}".format(prefix, column) for column in columns]
+            )
+
+        insert = "INSERT INTO {} (rowid, {}) VALUES ({});".format(
+            fts_table, ", ".join(columns), values("new")
+        )
+        delete = "INSERT INTO {} ({}, rowid, {}) VALUES ('delete', {});".format(
+            fts_table, fts_table, ", ".join(columns), values("old")
+        )
+
+        self.execute(
+            connection,
+            [
+                "CREATE VIRTUAL TABLE IF NOT EXISTS {} USING fts5({}, content={}, content_rowid={})".format(
+                    fts_table, ", ".join(columns), table, pk
+                ),
+                "CREATE TRIGGER IF NOT EXISTS {} AFTER INSERT ON {} BEGIN {} END".format(
+                    qn(self.get_table_name(model) + "_insert"), table, insert
+                ),
+                "CREATE TRIGGER IF NOT EXISTS {} AFTER DELETE ON {} BEGIN {} END".format(
+                    qn(self.get_table_name(model) + "_delete"), table, delete
+                ),
+                "CREATE TRIGGER IF NOT EXISTS {} AFTER UPDATE ON {} BEGIN {} {} END".format(
+                    qn(self.get_table_name(model) + "_update"), table, delete, insert
+                ),
+                "INSERT INTO {} ({}) VALUES ('rebuild')".format(fts_table, fts_table),
+            ],
+        )
+
+    def drop_index(self, model, connection):
+        qn = connection.ops.quote_name
+        self.execute(
+            connection,
+            [
+                "DROP TRIGGER IF EXISTS {}".format(
+                    qn(self.get_table_name(model) + suffix)
+                )
+                for suffix in ("_insert", "_delete", "_update")
+            ]
+            + [
+                "DROP TABLE IF EXISTS {}".format(qn(self.get_table_name(model))),
+            ],
+        )
@@ -0,0 +1,84 @@
+"""
+Signal receivers that keep herald's caches up to date
+"""
+
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils.autoreload import file_changed
+
+from .base import clear_html2text_cache, clear_template_cache, clear_twilio_client
+from .models import Notification, UserNotification
+from .utils import invalidate_disabled_notifications
+
+
+def invalidate_on_commit(user_ids, using):
+    """
+    Invalidates the cached disabled notifications once the transaction commits.
+    A send in between would otherwise cache the preferences from before the change again.
+    """
+
+    user_ids = list(user_ids)
+    transaction.on_commit(
+        lambda: invalidate_disabled_notifications(user_ids), using=using
+    )
+
+
+@receiver(m2m_changed, sender=UserNotification.disabled_notifications.through)
+def disabled_notifications_changed(
+    sender, instance, action, reverse, pk_set, using, **kwargs
+):
+    """
+    Invalidates the cached disabled notifications when they are added or removed
+    """
+
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            invalidate_on_commit([instance.pk], using)
+    elif action == "pre_clear":
+        # the affected users are unknown once the rows are gone
+        instance._herald_cleared_user_ids = list(
+            instance.usernotification_set.values_list("pk", flat=True)
+        )
+    elif action == "post_clear":
+        invalidate_on_commit(instance._herald_cleared_user_ids, using)
+    elif action in ("post_add", "post_remove"):
+        invalidate_on_commit(pk_set, using)
+
+
+@receiver(post_save, sender=UserNotification)
+@receiver(post_delete, sender=UserNotification)
+def user_notification_changed(sender, instance, using, **kwargs):
+    invalidate_on_commit([instance.pk], using)
+
+
+@receiver(pre_delete, sender=Notification)
+def notification_deleted(sender, instance, using, **kwargs):
+    # the cascade to the disabled notifications does not send m2m_changed
+    invalidate_on_commit(
+        instance.usernotification_set.values_list("pk", flat=True), using
+    )
+
+
+@receiver(setting_changed)
+def herald_settings_changed(setting, **kwargs):
+    if setting in ("TEMPLATES", "HERALD_TEMPLATE_CACHE"):
+        clear_template_cache()
+
+    if setting in ("HERALD_HTML2TEXT_CONFIG", "HERALD_HTML2TEXT_CACHE_SIZE"):
+        clear_html2text_cache()
+
+    if setting in (
+        "TWILIO_ACCOUNT_SID",
+        "TWILIO_AUTH_TOKEN",
+        "HERALD_TWILIO_CONCURRENCY",
+        "HERALD_TWILIO_RATE_LIMIT",
+    ):
+        clear_twilio_client()
+
+
+@receiver(file_changed)
+def template_file_changed(file_path, **kwargs):
+    # leave the reload decision to django, only drop the compiled templates
+    clear_template_cache()
@@ -5,7 +5,7 @@ from .views import TestNotification, TestNotificationList
 urlpatterns = [
     re_path(r"^$", TestNotificationList.as_view(), name="herald_preview_list"),
     re_path(
-        r"^(?P<index>\d+)/(?P<type>[\w\-]+)/$",
+        r"^(?P<class_path>[\w.]+)/(?P<type>[\w\-]+)/$",
         TestNotification.as_view(),
         name="herald_preview",
     ),
@@ -1,6 +1,24 @@
+import logging
+from functools import lru_cache
+from itertools import groupby
+from operator import attrgetter
+import threading
+import time
+
 from django.apps import apps as django_apps
+from django.core.cache import caches
 from django.core.exceptions import ImproperlyConfigured
 from django.conf import settings
+from django.db import transaction
+from django.db.models.deletion import Collector
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+RETENTION_CACHE_KEY = "herald:retention_cleanup"
+DISABLED_NOTIFICATIONS_CACHE_KEY = "herald:disabled_notifications:{}"
+DUPLICATE_CACHE_KEY = "herald:duplicate:{}"
 
 
 def get_sent_notification_model():
@@ -17,3 +35,309 @@ def get_sent_notification_model():
         raise ImproperlyConfigured(
             f"SENT_NOTIFICATION_MODEL refers to model '{sent_notification}' that has not been installed"
         )
+
+
+def get_notification_class(class_path):
+    """
+    Returns the notification class for a class path, from the registry
+    or imported once per process for classes that are not registered
+    """
+
+    from . import registry
+
+    return registry.get(class_path) or _import_notification_class(class_path)
+
+
+@lru_cache(maxsize=None)
+def _import_notification_class(class_path):
+    return import_string(class_path)
+
+
+def get_cache():
+    return caches[getattr(settings, "HERALD_CACHE", "default")]
+
+
+def get_disabled_notifications_timeout():
+    """
+    Returns HERALD_USER_NOTIFICATION_CACHE_TIMEOUT, which defaults to an hour for shared caches.
+    Invalidations never reach the other processes of a per process cache such as LocMemCache,
+    so preferences are only cached for a minute there unless the setting is set.
+    """
+
+    timeout = getattr(settings, "HERALD_USER_NOTIFICATION_CACHE_TIMEOUT", None)
+
+    if timeout is not None:
+        return timeout
+
+    from django.core.cache.backends.locmem import LocMemCache
+
+    return 60 if isinstance(get_cache(), LocMemCache) else 3600
+
+
+def get_disabled_notifications(user_id):
+    """
+    Returns the set of notification class paths the user has disabled, cached per user
+    """
+
+    if user_id is None:
+        return frozenset()
+
+    return get_disabled_notifications_for_users([user_id])[user_id]
+
+
+def get_disabled_notifications_for_users(user_ids):
+    """
+    Returns a dict of user id to the set of notification class paths that user has disabled.
+    Users missing from the cache are loaded with a single query.
+    """
+
+    user_ids = {x for x in user_ids if x is not None}
+
+    if not user_ids:
+        return {}
+
+    cache = get_cache()
+    keys = {DISABLED_NOTIFICATIONS_CACHE_KEY.format(x): x for x in user_ids}
+    disabled = {keys[key]: value for key, value in cache.get_many(keys).items()}
+
+    missing = user_ids.difference(disabled)
+
+    if missing:
+        UserNotification = django_apps.get_model("herald", "UserNotification")
+        loaded = {x: set() for x in missing}
+
+        for (
+            user_id,
+            notification_class,
+        ) in UserNotification.disabled_notifications.through.objects.filter(
+            usernotification_id__in=missing
+        ).values_list(
+            "usernotification_id", "notification__notification_class"
+        ):
+            loaded[user_id].add(notification_class)
+
+        loaded = {key: frozenset(value) for key, value in loaded.items()}
+        cache.set_many(
+            {DISABLED_NOTIFICATIONS_CACHE_KEY.format(x): y for x, y in loaded.items()},
+            get_disabled_notifications_timeout(),
+        )
+        disabled.update(loaded)
+
+    return disabled
+
+
+def invalidate_disabled_notifications(user_ids):
+    """
+    Removes the cached disabled notifications of the users
+    """
+
+    get_cache().delete_many(
+        [DISABLED_NOTIFICATIONS_CACHE_KEY.format(x) for x in user_ids]
+    )
+
+
+def delete_in_batches(queryset, batch_size=1000, progress=None, max_batches=None):
+    """
+    Deletes the rows of the queryset in primary key ranges of at most batch_size rows,
+    each range in its own small transaction, so no single statement has to lock or collect the whole set.
+    Ranges are deleted with a raw DELETE when no signals or cascades need the deletion collector.
+    progress is called with the running total after every range.
+    At most max_batches ranges are deleted, when it is given.
+    returns the number of rows deleted
+    """
+
+    queryset = queryset.order_by()
+    db = queryset.db
+    deleted = 0
+    batches = 0
+    start = None
+
+    while max_batches is None or batches < max_batches:
+        batches += 1
+        remaining = queryset if start is None else queryset.filter(pk__gt=start)
+        boundary = list(
+            remaining.order_by("pk").values_list("pk", flat=True)[
+                batch_size - 1 : batch_size
+            ]
+        )
+        end = boundary[0] if boundary else None
+
+        chunk = remaining if end is None else remaining.filter(pk__lte=end)
+
+        with transaction.atomic(using=db):
+            if Collector(using=db).can_fast_delete(chunk):
+                chunk_deleted = chunk._raw_delete(using=db) or 0
+            else:
+                # the collector only needs the primary keys, not the large content columns,
+                # and only the rows of the queryset's model are counted, not the cascaded ones
+                chunk_deleted = (
+                    chunk.only("pk").delete()[1].get(queryset.model._meta.label, 0)
+                )
+
+        deleted += chunk_deleted
+
+        if progress is not None and chunk_deleted:
+            progress(deleted)
+
+        if end is None:
+            break
+
+        start = end
+
+    return deleted
+
+
+def delete_expired_notifications(batch_size=None, max_batches=None):
+    """
+    Deletes any notifications that have passed the HERALD_NOTIFICATION_RETENTION_TIME setting,
+    then the stored attachments and contents they no longer reference.
+    Each of those deletes at most max_batches batches, when it is given.
+    returns the number of notifications deleted
+    """
+
+    retention_time = getattr(settings, "HERALD_NOTIFICATION_RETENTION_TIME", None)
+
+    if not retention_time:
+        return 0
+
+    if batch_size is None:
+        batch_size = getattr(settings, "HERALD_NOTIFICATION_RETENTION_BATCH_SIZE", 1000)
+
+    SentNotification = get_sent_notification_model()
+
+    cutoff_date = timezone.now() - retention_time
+
+    count = delete_in_batches(
+        SentNotification.objects.filter(date_sent__lt=cutoff_date),
+        batch_size,
+        max_batches=max_batches,
+    )
+    logger.info("Deleted %s expired notifications.", count)
+
+    from .attachments import delete_unreferenced_attachments
+
+    attachment_count = delete_unreferenced_attachments(
+        batch_size=batch_size, max_batches=max_batches
+    )
+    logger.info("Deleted %s unreferenced attachments.", attachment_count)
+
+    from .contents import delete_unreferenced_contents
+
+    content_count = delete_unreferenced_contents(
+        batch_size=batch_size, max_batches=max_batches
+    )
+    logger.info("Deleted %s unreferenced contents.", content_count)
+
+    return count
+
+
+def resend_sent_notifications(sent_notifications):
+    """
+    Resends saved sent notifications grouped by class, so each group goes over one shared connection
+    and has its statuses written back with a single bulk update.
+    Notifications whose class cannot be imported are marked as failed.
+    returns the number of notifications resent successfully
+    """
+
+    SentNotification = get_sent_notification_model()
+    resent = 0
+
+    for class_path, group in groupby(
+        sorted(sent_notifications, key=attrgetter("notification_class")),
+        key=attrgetter("notification_class"),
+    ):
+        group = list(group)
+
+        try:
+            notification_class = get_notification_class(class_path)
+        except ImportError as exc:
+            for sent_notification in group:
+                sent_notification.status = SentNotification.STATUS_FAILED
+                sent_notification.error_message = str(exc)
+                sent_notification.date_sent = timezone.now()
+            SentNotification.objects.bulk_update(
+                group, ["status", "date_sent", "error_message"]
+            )
+            continue
+
+        resent += sum(notification_class.resend_many(group))
+
+    return resent
+
+
+def resend_notifications(queryset, batch_size=100, progress=None):
+    """
+    Resends the sent notifications of the queryset in primary key order, batch_size at a time.
+    Batches are read by primary key rather than by offset, since resending changes the rows the queryset matches.
+    progress is called with the running number of notifications processed after every batch.
+    returns the number of notifications resent successfully and the number processed
+    """
+
+    queryset = (
+        queryset.defer(None).order_by("pk").prefetch_related("text_body", "html_body")
+    )
+    resent = 0
+    total = 0
+    last_pk = None
+
+    while True:
+        remaining = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        batch = list(remaining[:batch_size])
+
+        if not batch:
+            return resent, total
+
+        last_pk = batch[-1].pk
+        resent += resend_sent_notifications(batch)
+        total += len(batch)
+
+        if progress is not None:
+            progress(total)
+
+
+def queue_notifications(queryset):
+    """
+    Queues the sent notifications of the queryset to be resent by the heraldworker command, with a single update.
+    Notifications saved without their content are skipped, so their history is kept.
+    returns the number of notifications queued
+    """
+
+    return (
+        queryset.filter(content_stored=True)
+        .order_by()
+        .update(status=queryset.model.STATUS_QUEUED)
+    )
+
+
+class TokenBucket:
+    """
+    Thread safe token bucket that allows rate operations per second, in bursts of up to capacity operations
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Takes a token, blocking until one is available
+        """
+
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait = (1 - self.tokens) / self.rate
+
+            time.sleep(wait)
@@ -3,7 +3,7 @@ Views for testing notifications. Should not be present in production
 """
 
 from django.conf import settings
-from django.http import HttpResponse
+from django.http import Http404, HttpResponse
 from django.views.generic import TemplateView, View
 
 from . import registry
@@ -20,8 +20,13 @@ class TestNotificationList(TemplateView):
         context = super(TestNotificationList, self).get_context_data(**kwargs)
 
         context["notifications"] = [
-            (index, x.__name__, x.render_types, (y.__name__ for y in x.__bases__))
-            for index, x in enumerate(registry._registry)  # pylint: disable=W0212
+            (
+                x.get_class_path(),
+                x.__name__,
+                x.render_types,
+                (y.__name__ for y in x.__bases__),
+            )
+            for x in registry.get_notification_classes()
         ]
 
         return context
@@ -37,16 +42,16 @@ class TestNotification(View):
         GET request
         """
 
-        index = int(kwargs["index"])
         render_type = kwargs["type"]
 
-        obj = registry._registry[index](
-            *registry._registry[index].get_demo_args()
-        )  # pylint: disable=W0212
+        notification_class = registry.get(kwargs["class_path"])
 
-        context = obj.get_context_data()
+        if notification_class is None:
+            raise Http404("No notification is registered for this class path.")
 
-        content = obj.render(render_type, context)
+        obj = notification_class(*notification_class.get_demo_args())
+
+        content = obj.render(render_type, obj.context_data)
 
         render_type = "plain" if render_type == "text" else render_type
         charset = settings.DEFAULT_CHARSET
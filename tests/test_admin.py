@@ -1,9 +1,12 @@
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 from mock import patch
 
+from herald.admin import EstimatedCountPaginator, get_estimated_count
 from herald.utils import get_sent_notification_model
 
 SentNotification = get_sent_notification_model()
@@ -27,6 +30,90 @@ class ViewsTests(TestCase):
         response = self.client.get(reverse("admin:herald_sentnotification_changelist"))
         self.assertEqual(response.status_code, 200)
 
+    def test_index_defers_content(self):
+        response = self.client.get(reverse("admin:herald_sentnotification_changelist"))
+
+        self.assertTrue(
+            {"text_content", "html_content", "attachments"}
+            <= response.context["cl"].result_list[0].get_deferred_fields()
+        )
+
+    def test_index_notification_class_filter(self):
+        SentNotification.objects.create(
+            recipients="other@example.com",
+            date_sent=timezone.now(),
+            notification_class="tests.notifications.MyOtherNotification",
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse("admin:herald_sentnotification_changelist"),
+                {"notification_class": "tests.notifications.MyNotification"},
+            )
+
+        self.assertContains(response, "test@example.com")
+        self.assertNotContains(response, "other@example.com")
+        # the choices are not read from the sent notifications
+        self.assertFalse(
+            any(
+                'DISTINCT "herald_sentnotification"."notification_class"'
+                in query["sql"]
+                for query in queries.captured_queries
+            )
+        )
+
+    def test_estimated_count(self):
+        # sqlite keeps no row count estimate
+        self.assertIsNone(get_estimated_count(SentNotification.objects.all()))
+
+        with patch("herald.admin.get_estimated_count", return_value=500000):
+            paginator = EstimatedCountPaginator(
+                SentNotification.objects.order_by("pk"), 100
+            )
+            self.assertEqual(paginator.count, 500000)
+            self.assertEqual(paginator.num_pages, 5000)
+
+        paginator = EstimatedCountPaginator(
+            SentNotification.objects.order_by("pk"), 100
+        )
+        self.assertEqual(paginator.count, 1)
+
+    def test_resend_selected(self):
+        self.notification.status = SentNotification.STATUS_FAILED
+        self.notification.save()
+
+        with patch(
+            "herald.admin.resend_notifications", return_value=(1, 1)
+        ) as mocked_resend:
+            response = self.client.post(
+                reverse("admin:herald_sentnotification_changelist"),
+                {
+                    "action": "resend_selected",
+                    "_selected_action": [self.notification.pk],
+                },
+                follow=True,
+            )
+
+        self.assertEqual(list(mocked_resend.call_args[0][0]), [self.notification])
+        self.assertIn(
+            "1 of 1 notification(s) were resent successfully.",
+            [m.message for m in list(response.context["messages"])],
+        )
+
+    def test_queue_selected(self):
+        response = self.client.post(
+            reverse("admin:herald_sentnotification_changelist"),
+            {"action": "queue_selected", "_selected_action": [self.notification.pk]},
+            follow=True,
+        )
+
+        self.notification.refresh_from_db()
+        self.assertEqual(self.notification.status, SentNotification.STATUS_QUEUED)
+        self.assertIn(
+            "1 notification(s) were queued for resending.",
+            [m.message for m in list(response.context["messages"])],
+        )
+
     def test_detail(self):
         response = self.client.get(
             reverse(
@@ -35,6 +122,20 @@ class ViewsTests(TestCase):
         )
         self.assertEqual(response.status_code, 200)
 
+    def test_detail_compressed(self):
+        with override_settings(
+            HERALD_COMPRESS_CONTENT=True, HERALD_COMPRESS_CONTENT_MIN_LENGTH=1
+        ):
+            self.notification.text_content = "Hello compressed World"
+            self.notification.save()
+
+        response = self.client.get(
+            reverse(
+                "admin:herald_sentnotification_change", args=(self.notification.pk,)
+            )
+        )
+        self.assertContains(response, "Hello compressed World")
+
     def test_resend(self):
         with patch.object(SentNotification, "resend") as mocked_resend:
             response = self.client.get(
@@ -51,6 +152,25 @@ class ViewsTests(TestCase):
             [m.message for m in list(response.context["messages"])],
         )
 
+    def test_resend_link_hidden_without_content(self):
+        change_url = reverse(
+            "admin:herald_sentnotification_change", args=(self.notification.pk,)
+        )
+        resend_url = reverse(
+            "admin:herald_sentnotification_resend", args=(self.notification.pk,)
+        )
+        self.assertContains(self.client.get(change_url), resend_url)
+
+        SentNotification.objects.filter(pk=self.notification.pk).update(
+            content_stored=False
+        )
+        response = self.client.get(change_url)
+
+        self.assertNotContains(response, resend_url)
+        self.assertContains(
+            response, "The content of this notification was not stored."
+        )
+
     def test_resend_fail(self):
         with patch.object(SentNotification, "resend") as mocked_resend:
             mocked_resend.return_value = False
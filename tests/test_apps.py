@@ -1,6 +1,6 @@
 from django.apps import apps
 from django.db.utils import OperationalError, ProgrammingError
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from mock import patch
 
 from herald import registry
@@ -27,7 +27,7 @@ class AppsTests(TestCase):
     def setUp(self):
         """Set up for tests."""
         # Store the original registry and clear it for isolated testing
-        self.original_registry = list(registry._registry)
+        self.original_registry = dict(registry._registry)
         registry._registry.clear()
 
         # Register our test notification
@@ -89,9 +89,9 @@ class AppsTests(TestCase):
         """
         # Arrange
         with patch(
-            "herald.models.Notification.objects.get_or_create",
+            "django.db.models.query.QuerySet.in_bulk",
             side_effect=OperationalError("mocked error"),
-        ) as mock_get_or_create:
+        ) as mock_in_bulk:
             # Act
             try:
                 register_notifications(sender=self.sender)
@@ -99,7 +99,7 @@ class AppsTests(TestCase):
                 self.fail("OperationalError was not handled by the function.")
 
             # Assert
-            mock_get_or_create.assert_called_once()
+            mock_in_bulk.assert_called_once()
 
     def test_programming_error_is_handled(self):
         """
@@ -107,9 +107,9 @@ class AppsTests(TestCase):
         """
         # Arrange
         with patch(
-            "herald.models.Notification.objects.get_or_create",
+            "django.db.models.query.QuerySet.in_bulk",
             side_effect=ProgrammingError("mocked error"),
-        ) as mock_get_or_create:
+        ) as mock_in_bulk:
             # Act
             try:
                 register_notifications(sender=self.sender)
@@ -117,4 +117,68 @@ class AppsTests(TestCase):
                 self.fail("ProgrammingError was not handled by the function.")
 
             # Assert
-            mock_get_or_create.assert_called_once()
+            mock_in_bulk.assert_called_once()
+
+    def test_queries(self):
+        """
+        Test that registering many notifications takes a fixed number of queries.
+        """
+        # Arrange
+        classes = [
+            type(
+                "TestNotification{}".format(i),
+                (EmailNotification,),
+                {"verbose_name": "Test {}".format(i)},
+            )
+            for i in range(5)
+        ]
+        for klass in classes:
+            registry.register(klass)
+        register_notifications(sender=self.sender)
+
+        # Act / Assert: unchanged rows are not written again
+        with self.assertNumQueries(1):
+            register_notifications(sender=self.sender)
+
+        # Act / Assert: one read and one bulk update for the changed rows
+        Notification.objects.filter(
+            notification_class__in=[x.get_class_path() for x in classes[:2]]
+        ).update(verbose_name="Old Name")
+        with self.assertNumQueries(2):
+            register_notifications(sender=self.sender)
+        self.assertFalse(Notification.objects.filter(verbose_name="Old Name").exists())
+
+    def test_stale_notification_kept(self):
+        """
+        Test that notifications no longer registered are kept by default.
+        """
+        # Arrange
+        Notification.objects.create(notification_class="tests.Removed")
+
+        # Act
+        with self.assertLogs("herald.apps", "WARNING") as logs:
+            register_notifications(sender=self.sender)
+
+        # Assert
+        self.assertTrue(
+            Notification.objects.filter(notification_class="tests.Removed").exists()
+        )
+        self.assertIn("tests.Removed", logs.output[0])
+
+    @override_settings(HERALD_DELETE_STALE_NOTIFICATIONS=True)
+    def test_stale_notification_deleted(self):
+        """
+        Test that notifications no longer registered are deleted when enabled.
+        """
+        # Arrange
+        Notification.objects.create(notification_class="tests.Removed")
+
+        # Act
+        with self.assertNoLogs("herald.apps"):
+            register_notifications(sender=self.sender)
+
+        # Assert
+        self.assertEqual(
+            list(Notification.objects.values_list("notification_class", flat=True)),
+            [TestRegisterNotification.get_class_path()],
+        )
@@ -0,0 +1,248 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from email.mime.image import MIMEImage
+from io import StringIO
+
+import jsonpickle
+import mock
+from django.core import mail
+from django.core.files import File
+from django.core.management import call_command
+from django.db.models.query import QuerySet
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from herald.attachments import (
+    StoredMIMEPart,
+    decode_attachments,
+    delete_unreferenced_attachments,
+    encode_attachments,
+    get_attachment_path,
+    get_attachment_storage,
+)
+from herald.base import EmailNotification
+from herald.models import SentNotification, StoredAttachment
+
+from .notifications import MyNotification
+
+
+class StoredAttachmentTests(TestCase):
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            HERALD_ATTACHMENT_STORAGE="django.core.files.storage.FileSystemStorage",
+            HERALD_ATTACHMENT_STORAGE_OPTIONS={"location": self.location},
+        )
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.location)
+
+    def test_send(self):
+        MyNotification().send(raise_exception=True)
+        MyNotification().send(raise_exception=True)
+
+        # both notifications reference the same two stored attachments
+        self.assertEqual(StoredAttachment.objects.count(), 2)
+        for sent_notification in SentNotification.objects.all():
+            self.assertNotIn("Some Report Data", sent_notification.attachments)
+            self.assertEqual(sent_notification.stored_attachments.count(), 2)
+
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(
+            mail.outbox[1].attachments[0],
+            ("Report.txt", "Some Report Data", "text/plain"),
+        )
+
+    def test_get_attachments(self):
+        MyNotification().send(raise_exception=True)
+
+        attachments = SentNotification.objects.get().get_attachments()
+
+        self.assertEqual(
+            attachments[0], ("Report.txt", b"Some Report Data", "text/plain")
+        )
+        self.assertIsInstance(attachments[1], StoredMIMEPart)
+        self.assertEqual(attachments[1]["Content-ID"], "<python.jpg>")
+        with open("tests/python.jpeg", "rb") as f:
+            self.assertEqual(attachments[1].get_payload(decode=True), f.read())
+
+    def test_send_many_file(self):
+        class TestNotification(EmailNotification):
+            template_name = "hello_world"
+            to_emails = ["test@test.com"]
+
+            def get_attachments(self):
+                return [File(open("tests/python.jpeg", "rb"))]
+
+        TestNotification.send_many([TestNotification(), TestNotification()])
+
+        stored = StoredAttachment.objects.get()
+        with open("tests/python.jpeg", "rb") as f:
+            self.assertEqual(stored.size, len(f.read()))
+        self.assertEqual(SentNotification.stored_attachments.through.objects.count(), 2)
+        self.assertEqual(mail.outbox[1].attachments[0][0], "tests/python.jpeg")
+
+    def test_delete_unreferenced(self):
+        MyNotification().send(raise_exception=True)
+        storage = get_attachment_storage()
+
+        # still referenced
+        self.assertEqual(delete_unreferenced_attachments(grace_period=timedelta()), 0)
+
+        SentNotification.objects.all().delete()
+        self.assertEqual(delete_unreferenced_attachments(), 0)
+
+        digests = list(StoredAttachment.objects.values_list("pk", flat=True))
+        self.assertEqual(delete_unreferenced_attachments(grace_period=timedelta()), 2)
+        self.assertEqual(StoredAttachment.objects.count(), 0)
+        for digest in digests:
+            self.assertFalse(storage.exists(get_attachment_path(digest)))
+
+    def test_delete_unreferenced_used_meanwhile(self):
+        MyNotification().send(raise_exception=True)
+        SentNotification.objects.all().delete()
+        storage = get_attachment_storage()
+        select_for_update = QuerySet.select_for_update
+
+        def send_first(queryset, *args, **kwargs):
+            # the attachments are sent again after they were selected for deletion
+            MyNotification().send(raise_exception=True)
+            return select_for_update(queryset, *args, **kwargs)
+
+        with mock.patch.object(
+            QuerySet, "select_for_update", autospec=True, side_effect=send_first
+        ):
+            self.assertEqual(
+                delete_unreferenced_attachments(grace_period=timedelta()), 0
+            )
+
+        self.assertEqual(StoredAttachment.objects.count(), 2)
+        for digest in StoredAttachment.objects.values_list("pk", flat=True):
+            self.assertTrue(storage.exists(get_attachment_path(digest)))
+        self.assertEqual(
+            SentNotification.objects.get().get_attachments()[0],
+            ("Report.txt", b"Some Report Data", "text/plain"),
+        )
+
+    def test_last_used_throttled(self):
+        MyNotification().send(raise_exception=True)
+        recently = timezone.now() - timedelta(minutes=5)
+        StoredAttachment.objects.update(last_used=recently)
+
+        MyNotification().send(raise_exception=True)
+        self.assertEqual(
+            set(StoredAttachment.objects.values_list("last_used", flat=True)),
+            {recently},
+        )
+
+        StoredAttachment.objects.update(last_used=recently - timedelta(hours=1))
+        MyNotification().send(raise_exception=True)
+        for last_used in StoredAttachment.objects.values_list("last_used", flat=True):
+            self.assertGreater(last_used, recently)
+
+
+class EncodedAttachmentTests(TestCase):
+    def setUp(self):
+        with open("tests/python.jpeg", "rb") as f:
+            self.image_data = f.read()
+        self.image = MIMEImage(self.image_data)
+        self.image.add_header("Content-ID", "<python.jpg>")
+
+    def test_round_trip(self):
+        attachments = decode_attachments(
+            encode_attachments(
+                [
+                    ("Report.txt", "Some Report Data", "text/plain"),
+                    ("Report.bin", b"\x00\xff", None),
+                    File(open("tests/python.jpeg", "rb")),
+                    self.image,
+                ]
+            )
+        )
+
+        self.assertEqual(
+            attachments[0], ("Report.txt", "Some Report Data", "text/plain")
+        )
+        self.assertEqual(attachments[1], ("Report.bin", b"\x00\xff", None))
+        self.assertEqual(
+            attachments[2], ("tests/python.jpeg", self.image_data, "image/jpeg")
+        )
+        self.assertIsInstance(attachments[3], StoredMIMEPart)
+        self.assertEqual(attachments[3]["Content-ID"], "<python.jpg>")
+        self.assertEqual(attachments[3].get_payload(decode=True), self.image_data)
+
+    def test_resend(self):
+        MyNotification().send(raise_exception=True)
+        sent_notification = SentNotification.objects.get()
+
+        self.assertTrue(sent_notification.attachments.startswith('{"encoded'))
+        self.assertTrue(sent_notification.resend())
+        self.assertEqual(
+            mail.outbox[1].attachments[0],
+            ("Report.txt", "Some Report Data", "text/plain"),
+        )
+
+    def test_read_jsonpickle(self):
+        attachments = [("Report.txt", "Some Report Data", "text/plain"), self.image]
+        sent_notification = SentNotification(attachments=jsonpickle.dumps(attachments))
+
+        self.assertEqual(
+            sent_notification.get_attachments()[0],
+            ("Report.txt", "Some Report Data", "text/plain"),
+        )
+        self.assertEqual(
+            sent_notification.get_attachments()[1].get_payload(decode=True),
+            self.image_data,
+        )
+
+    def test_convert_command(self):
+        legacy = SentNotification.objects.create(
+            notification_class="tests.notifications.MyNotification",
+            date_sent=timezone.now(),
+            attachments=jsonpickle.dumps(
+                [("Report.txt", "Some Report Data", "text/plain"), self.image]
+            ),
+        )
+        SentNotification.objects.create(
+            notification_class="tests.notifications.MyNotification",
+            date_sent=timezone.now(),
+            attachments=encode_attachments([]),
+        )
+        SentNotification.objects.create(
+            notification_class="tests.notifications.MyNotification",
+            date_sent=timezone.now(),
+        )
+        out = StringIO()
+
+        call_command("heraldconvertattachments", batch_size=1, stdout=out)
+
+        self.assertIn("Successfully converted 1 notification(s)", out.getvalue())
+        legacy.refresh_from_db()
+        self.assertTrue(legacy.attachments.startswith('{"encoded_attachments"'))
+        self.assertEqual(
+            legacy.get_attachments()[0],
+            ("Report.txt", "Some Report Data", "text/plain"),
+        )
+        self.assertEqual(
+            legacy.get_attachments()[1].get_payload(decode=True), self.image_data
+        )
+
+        out = StringIO()
+        call_command("heraldconvertattachments", stdout=out)
+        self.assertIn("Successfully converted 0 notification(s)", out.getvalue())
+
+    def test_convert_command_invalid(self):
+        SentNotification.objects.create(
+            notification_class="tests.notifications.MyNotification",
+            date_sent=timezone.now(),
+            attachments="not json",
+        )
+        out = StringIO()
+
+        call_command("heraldconvertattachments", stdout=out, stderr=StringIO())
+
+        self.assertIn("Failed to convert 1 notification(s)", out.getvalue())
+        self.assertEqual(SentNotification.objects.get().attachments, "not json")
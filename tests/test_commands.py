@@ -1,14 +1,21 @@
 from datetime import datetime, timedelta
 from io import StringIO
 
+import mock
+from django.core import mail
 from django.core.exceptions import ValidationError
-from django.core.management import call_command
-from django.test import TestCase
+from django.core.management import CommandError, call_command
+from django.db.models import ExpressionWrapper, F, TextField
+from django.test import TestCase, override_settings
 from django.utils import timezone
 
+from herald.fields import is_compressed
 from herald.management.commands.delnotifs import valid_date
+from herald.management.commands.heraldworker import Command as HeraldWorkerCommand
 from herald.models import SentNotification
 
+from .notifications import MyOtherNotification
+
 MSG = "Successfully deleted {num} notification(s)"
 NOTIFICATION_CLASS = "tests.notifications.MyNotification"
 
@@ -72,3 +79,318 @@ class DeleteNotification(TestCase):
 
         with self.assertRaises(ValidationError):
             call_command("delnotifs", stdout=self.out, start="01-01-2016")
+
+    def test_older_than(self):
+        out = StringIO()
+        call_command("delnotifs", stdout=out, older_than=2, batch_size=1, verbosity=2)
+        self.assertEqual(
+            out.getvalue(),
+            "Deleted 1 notification(s) so far\n"
+            "Deleted 2 notification(s) so far\n" + MSG.format(num=2) + "\n",
+        )
+
+    def test_status_and_class(self):
+        SentNotification.objects.filter(date_sent__gte=self.today).update(
+            status=SentNotification.STATUS_FAILED
+        )
+        SentNotification(
+            notification_class="tests.notifications.MyOtherNotification",
+            date_sent=timezone.now(),
+            status=SentNotification.STATUS_FAILED,
+        ).save()
+
+        out = StringIO()
+        call_command(
+            "delnotifs",
+            stdout=out,
+            start=str(self.today - timedelta(days=3)),
+            status=["failed"],
+            notification_class=[NOTIFICATION_CLASS],
+        )
+        self.assertIn(MSG.format(num=2), out.getvalue())
+        self.assertEqual(SentNotification.objects.count(), 4)
+
+    def test_status_without_dates(self):
+        SentNotification.objects.update(status=SentNotification.STATUS_FAILED)
+
+        out = StringIO()
+        call_command("delnotifs", stdout=out, status=["failed"])
+
+        # not only the notifications sent today
+        self.assertIn(MSG.format(num=5), out.getvalue())
+
+    def test_invalid_status(self):
+        with self.assertRaises(CommandError):
+            call_command("delnotifs", stdout=StringIO(), status=["unknown"])
+
+    def test_count_excludes_cascaded_rows(self):
+        SentNotification.objects.all().delete()
+        for _ in range(3):
+            MyOtherNotification().send()
+        # the recipient links are deleted along with the notifications
+        self.assertEqual(
+            SentNotification.recipient_addresses.through.objects.count(), 3
+        )
+
+        out = StringIO()
+        call_command("delnotifs", stdout=out)
+
+        self.assertIn(MSG.format(num=3), out.getvalue())
+        self.assertEqual(
+            SentNotification.recipient_addresses.through.objects.count(), 0
+        )
+
+    def test_dry_run(self):
+        out = StringIO()
+        call_command("delnotifs", stdout=out, older_than=0, dry_run=True)
+        self.assertIn("Would delete 5 notification(s)", out.getvalue())
+        self.assertEqual(SentNotification.objects.count(), 5)
+
+
+class HeraldWorker(TestCase):
+    def test_send_queued(self):
+        self.assertTrue(MyOtherNotification().send(deferred=True))
+        MyOtherNotification.send_many([MyOtherNotification()], deferred=True)
+
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(
+            SentNotification.objects.filter(
+                status=SentNotification.STATUS_QUEUED
+            ).count(),
+            2,
+        )
+
+        out = StringIO()
+        call_command("heraldworker", once=True, batch_size=1, stdout=out)
+
+        self.assertIn("Sent 2 queued notification(s)", out.getvalue())
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(
+            SentNotification.objects.filter(
+                status=SentNotification.STATUS_SUCCESS
+            ).count(),
+            2,
+        )
+
+    def test_skips_other_statuses(self):
+        SentNotification.objects.create(
+            notification_class=NOTIFICATION_CLASS,
+            date_sent=timezone.now(),
+            status=SentNotification.STATUS_FAILED,
+        )
+
+        call_command("heraldworker", once=True, stdout=StringIO())
+
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_unknown_class(self):
+        SentNotification.objects.create(
+            recipients="test@test.com",
+            notification_class="tests.notifications.DoesNotExist",
+            date_sent=timezone.now(),
+            status=SentNotification.STATUS_QUEUED,
+        )
+
+        call_command("heraldworker", once=True, stdout=StringIO())
+
+        self.assertEqual(
+            SentNotification.objects.get().status, SentNotification.STATUS_FAILED
+        )
+
+    def test_reclaims_expired_lease(self):
+        for claimed_at in [timezone.now() - timedelta(hours=1), timezone.now(), None]:
+            SentNotification.objects.create(
+                recipients="test@test.com",
+                text_content="Hello World",
+                notification_class=NOTIFICATION_CLASS,
+                date_sent=timezone.now(),
+                status=SentNotification.STATUS_PENDING,
+                claimed_at=claimed_at,
+            )
+        out = StringIO()
+
+        call_command("heraldworker", once=True, lease=600, stdout=out)
+
+        # only the expired claim is taken again, sends outside the worker are never claimed
+        self.assertIn("Sent 1 queued notification(s)", out.getvalue())
+        self.assertEqual(
+            list(
+                SentNotification.objects.order_by("pk").values_list("status", flat=True)
+            ),
+            [
+                SentNotification.STATUS_SUCCESS,
+                SentNotification.STATUS_PENDING,
+                SentNotification.STATUS_PENDING,
+            ],
+        )
+
+    def test_failed_batch_continues(self):
+        MyOtherNotification().send(deferred=True)
+        process_batch = HeraldWorkerCommand.process_batch
+        calls = []
+
+        def fail_first(*args):
+            calls.append(args)
+            if len(calls) == 1:
+                raise Exception("database went away")
+            return process_batch(*args)
+
+        out = StringIO()
+        with (
+            mock.patch.object(
+                HeraldWorkerCommand,
+                "process_batch",
+                autospec=True,
+                side_effect=fail_first,
+            ),
+            mock.patch("time.sleep"),
+            self.assertLogs("herald.management.commands.heraldworker", "ERROR"),
+        ):
+            call_command("heraldworker", once=True, stdout=out)
+
+        self.assertIn("Sent 1 queued notification(s)", out.getvalue())
+        self.assertEqual(len(mail.outbox), 1)
+
+
+class HeraldResend(TestCase):
+    def create(self, status, notification_class=NOTIFICATION_CLASS, **kwargs):
+        kwargs.setdefault("date_sent", timezone.now())
+        return SentNotification.objects.create(
+            recipients="test@test.com",
+            text_content="Hello World",
+            notification_class=notification_class,
+            status=status,
+            **kwargs,
+        )
+
+    def test_resend_failed(self):
+        for _ in range(3):
+            self.create(SentNotification.STATUS_FAILED)
+        self.create(SentNotification.STATUS_SUCCESS)
+        out = StringIO()
+
+        call_command("heraldresend", batch_size=2, stdout=out)
+
+        self.assertIn("Successfully resent 3 of 3 notification(s)", out.getvalue())
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(
+            SentNotification.objects.filter(
+                status=SentNotification.STATUS_SUCCESS
+            ).count(),
+            4,
+        )
+
+    def test_filters(self):
+        self.create(SentNotification.STATUS_FAILED)
+        self.create(
+            SentNotification.STATUS_FAILED,
+            notification_class="tests.notifications.MyOtherNotification",
+        )
+        self.create(
+            SentNotification.STATUS_USER_DISABLED,
+            date_sent=timezone.now() - timedelta(days=10),
+        )
+
+        out = StringIO()
+        call_command(
+            "heraldresend",
+            notification_class=[NOTIFICATION_CLASS],
+            dry_run=True,
+            stdout=out,
+        )
+        self.assertIn("Would resend 1 notification(s)", out.getvalue())
+
+        out = StringIO()
+        call_command(
+            "heraldresend",
+            status=["failed", "user_disabled"],
+            newer_than=5,
+            dry_run=True,
+            stdout=out,
+        )
+        self.assertIn("Would resend 2 notification(s)", out.getvalue())
+
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_queue(self):
+        self.create(SentNotification.STATUS_FAILED)
+        out = StringIO()
+
+        call_command("heraldresend", queue=True, stdout=out)
+
+        self.assertIn("Successfully queued 1 notification(s)", out.getvalue())
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(
+            SentNotification.objects.get().status, SentNotification.STATUS_QUEUED
+        )
+
+    def test_invalid_status(self):
+        with self.assertRaises(CommandError):
+            call_command("heraldresend", status=["nope"], stdout=StringIO())
+
+
+class HeraldCleanup(TestCase):
+    def test_cleanup(self):
+        SentNotification.objects.create(
+            notification_class=NOTIFICATION_CLASS,
+            date_sent=timezone.now() - timedelta(weeks=52),
+        )
+        SentNotification.objects.create(
+            notification_class=NOTIFICATION_CLASS,
+            date_sent=timezone.now(),
+        )
+        out = StringIO()
+
+        with override_settings(HERALD_NOTIFICATION_RETENTION_TIME=timedelta(weeks=26)):
+            call_command("heraldcleanup", batch_size=1, stdout=out)
+
+        self.assertIn("Successfully deleted 1 expired notification(s)", out.getvalue())
+        self.assertEqual(SentNotification.objects.count(), 1)
+
+    def test_no_setting(self):
+        with self.assertRaises(CommandError):
+            call_command("heraldcleanup", stdout=StringIO())
+
+
+class HeraldCompress(TestCase):
+    def test_compress(self):
+        long_text = "x" * 2000
+        SentNotification.objects.create(
+            notification_class=NOTIFICATION_CLASS,
+            date_sent=timezone.now(),
+            text_content=long_text,
+        )
+        SentNotification.objects.create(
+            notification_class=NOTIFICATION_CLASS,
+            date_sent=timezone.now(),
+            text_content="short",
+        )
+        out = StringIO()
+
+        with override_settings(HERALD_COMPRESS_CONTENT=True):
+            call_command("heraldcompress", batch_size=1, stdout=out)
+            self.assertIn("Successfully compressed 1 notification(s)", out.getvalue())
+
+            # already compressed rows are skipped
+            out = StringIO()
+            call_command("heraldcompress", stdout=out)
+            self.assertIn("Successfully compressed 0 notification(s)", out.getvalue())
+
+        raw = SentNotification.objects.order_by("pk").values_list(
+            ExpressionWrapper(F("text_content"), output_field=TextField()), flat=True
+        )
+        self.assertTrue(is_compressed(raw[0]))
+        self.assertEqual(raw[1], "short")
+        self.assertEqual(
+            SentNotification.objects.order_by("pk").first().text_content, long_text
+        )
+
+    def test_not_enabled(self):
+        with self.assertRaises(CommandError):
+            call_command("heraldcompress", stdout=StringIO())
+
+
+class HeraldExtraDataIndex(TestCase):
+    def test_not_postgresql(self):
+        with self.assertRaises(CommandError):
+            call_command("heraldextradataindex", stdout=StringIO())
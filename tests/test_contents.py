@@ -0,0 +1,148 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection
+from django.db.models.query import QuerySet
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from mock import patch
+
+from herald.contents import delete_unreferenced_contents
+from herald.models import SentNotification, StoredContent
+
+from .notifications import MyNotification, MyOtherNotification
+
+
+@override_settings(HERALD_DEDUPLICATE_CONTENT=True)
+class StoredContentTests(TestCase):
+    def test_send(self):
+        MyNotification().send(raise_exception=True)
+        MyNotification().send(raise_exception=True)
+
+        # both notifications reference the same text and html content
+        self.assertEqual(StoredContent.objects.count(), 2)
+        self.assertEqual(
+            SentNotification.objects.filter(
+                text_content__isnull=True, html_content__isnull=True
+            ).count(),
+            2,
+        )
+        self.assertEqual(
+            SentNotification.objects.values("text_body", "html_body")
+            .distinct()
+            .count(),
+            1,
+        )
+
+        sent_notification = SentNotification.objects.first()
+        self.assertIn("Hello World", sent_notification.text_content)
+        self.assertIn("Hello World", sent_notification.html_content)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertIn("Hello World", mail.outbox[1].body)
+
+    def test_send_many(self):
+        with CaptureQueriesContext(connection) as queries:
+            MyOtherNotification.send_many(
+                [MyOtherNotification() for _ in range(5)], deferred=True
+            )
+        # reads and writes of the shared content don't grow with the batch
+        self.assertEqual(
+            len([x for x in queries if "herald_storedcontent" in x["sql"]]), 3
+        )
+        self.assertEqual(StoredContent.objects.count(), 2)
+
+        call_command("heraldworker", once=True, verbosity=0)
+
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertIn("Hello World", mail.outbox[4].body)
+
+    def test_resend(self):
+        MyNotification().send(raise_exception=True)
+
+        sent_notification = SentNotification.objects.get()
+        self.assertTrue(sent_notification.resend())
+
+        sent_notification.refresh_from_db()
+        self.assertIsNone(
+            SentNotification.objects.values_list("text_content", flat=True).get()
+        )
+        self.assertIn("Hello World", mail.outbox[1].body)
+
+    def test_admin(self):
+        MyNotification().send(raise_exception=True)
+        get_user_model().objects.create_superuser(
+            "admin", "admin@example.com", "password"
+        )
+        self.client.login(username="admin", password="password")
+
+        response = self.client.get(
+            reverse(
+                "admin:herald_sentnotification_change",
+                args=(SentNotification.objects.get().pk,),
+            )
+        )
+        self.assertContains(response, "Hello World")
+
+    def test_delete_unreferenced(self):
+        MyNotification().send(raise_exception=True)
+
+        # still referenced
+        self.assertEqual(delete_unreferenced_contents(grace_period=timedelta()), 0)
+
+        SentNotification.objects.all().delete()
+        self.assertEqual(delete_unreferenced_contents(), 0)
+
+        self.assertEqual(delete_unreferenced_contents(grace_period=timedelta()), 2)
+        self.assertEqual(StoredContent.objects.count(), 0)
+
+    def test_delete_unreferenced_used_meanwhile(self):
+        MyNotification().send(raise_exception=True)
+        SentNotification.objects.all().delete()
+        delete = QuerySet.delete
+
+        def use_first(queryset):
+            # the contents are sent again after they were selected for deletion
+            StoredContent.objects.update(last_used=timezone.now())
+            return delete(queryset)
+
+        with patch.object(QuerySet, "delete", autospec=True, side_effect=use_first):
+            self.assertEqual(delete_unreferenced_contents(grace_period=timedelta()), 0)
+
+        self.assertEqual(StoredContent.objects.count(), 2)
+
+    def test_last_used_throttled(self):
+        MyNotification().send(raise_exception=True)
+        recently = timezone.now() - timedelta(minutes=5)
+        StoredContent.objects.update(last_used=recently)
+
+        MyNotification().send(raise_exception=True)
+        self.assertEqual(
+            set(StoredContent.objects.values_list("last_used", flat=True)), {recently}
+        )
+
+        StoredContent.objects.update(last_used=recently - timedelta(hours=1))
+        MyNotification().send(raise_exception=True)
+        for last_used in StoredContent.objects.values_list("last_used", flat=True):
+            self.assertGreater(last_used, recently)
+
+    @override_settings(HERALD_CONTENT_POLICY="failed")
+    def test_content_policy(self):
+        with patch.object(
+            MyOtherNotification, "_send", side_effect=[None, Exception("error")]
+        ):
+            MyOtherNotification.send_many([MyOtherNotification() for _ in range(2)])
+
+        sent, failed = SentNotification.objects.order_by("pk")
+        self.assertIsNone(sent.text_body_id)
+        self.assertIsNone(sent.text_content)
+        self.assertIsNotNone(failed.text_body_id)
+        self.assertIn("Hello World", failed.text_content)
+        self.assertIsNone(
+            SentNotification.objects.values_list("text_content", flat=True).get(
+                pk=failed.pk
+            )
+        )
@@ -1,8 +1,11 @@
 from django.contrib.auth import get_user_model
 from django.core import mail
+from django.contrib.auth.tokens import default_token_generator
 from django.test import TestCase
+from mock import patch
 
 from herald.contrib.auth.forms import HeraldPasswordResetForm
+from herald.contrib.auth.notifications import PasswordResetEmail
 
 
 class ContribAuthTests(TestCase):
@@ -27,3 +30,19 @@ class ContribAuthTests(TestCase):
         form.save(domain_override="foo")
         self.assertEqual(len(mail.outbox), 1)
         self.assertEqual(mail.outbox[0].to, ["test@example.com"])
+
+    def test_context_computed_once(self):
+        User = get_user_model()
+        user = User.objects.create_user(
+            username="test@example.com", email="test@example.com", password="password"
+        )
+
+        with patch.object(
+            default_token_generator,
+            "make_token",
+            wraps=default_token_generator.make_token,
+        ) as mocked_make_token:
+            PasswordResetEmail(user).send(raise_exception=True)
+
+        mocked_make_token.assert_called_once()
+        self.assertEqual(len(mail.outbox), 1)
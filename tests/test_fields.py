@@ -0,0 +1,93 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import ExpressionWrapper, F, TextField
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from herald.fields import compress, decompress, get_compression_codec, is_compressed
+from herald.models import SentNotification
+
+from .notifications import MyNotification
+
+LONG_TEXT = "Hello World! " * 200
+
+
+def raw_content(pk):
+    return SentNotification.objects.filter(pk=pk).values_list(
+        ExpressionWrapper(F("text_content"), output_field=TextField()),
+        ExpressionWrapper(F("html_content"), output_field=TextField()),
+    )[0]
+
+
+class CompressionTests(TestCase):
+    def test_codec_setting(self):
+        self.assertIsNone(get_compression_codec())
+
+        with override_settings(HERALD_COMPRESS_CONTENT=True):
+            self.assertEqual(get_compression_codec(), "zlib")
+
+        with override_settings(HERALD_COMPRESS_CONTENT="foo"):
+            self.assertRaises(ImproperlyConfigured, get_compression_codec)
+
+    def test_round_trip(self):
+        value = compress(LONG_TEXT, "zlib")
+        self.assertTrue(is_compressed(value))
+        self.assertTrue(value.startswith("\x1bherald:zlib:1:"))
+        self.assertLess(len(value), len(LONG_TEXT))
+        self.assertEqual(decompress(value), LONG_TEXT)
+
+    def test_unknown_codec(self):
+        with self.assertRaises(ValueError):
+            decompress("\x1bherald:foo:1:")
+
+    @override_settings(HERALD_COMPRESS_CONTENT=True)
+    def test_save(self):
+        notification = SentNotification.objects.create(
+            notification_class="tests.notifications.MyNotification",
+            date_sent=timezone.now(),
+            text_content=LONG_TEXT,
+            html_content="<p>short</p>",
+        )
+
+        text_content, html_content = raw_content(notification.pk)
+        self.assertTrue(is_compressed(text_content))
+        self.assertEqual(html_content, "<p>short</p>")
+
+        notification.refresh_from_db()
+        self.assertEqual(notification.text_content, LONG_TEXT)
+
+        # compressed content stays readable after compression is turned off
+        with override_settings(HERALD_COMPRESS_CONTENT=False):
+            self.assertEqual(
+                SentNotification.objects.get(pk=notification.pk).text_content,
+                LONG_TEXT,
+            )
+
+    @override_settings(
+        HERALD_COMPRESS_CONTENT=True, HERALD_COMPRESS_CONTENT_MIN_LENGTH=10
+    )
+    def test_bulk_update(self):
+        notification = SentNotification.objects.create(
+            notification_class="tests.notifications.MyNotification",
+            date_sent=timezone.now(),
+        )
+        notification.html_content = "<p>Hello World!</p>"
+        SentNotification.objects.bulk_update([notification], ["html_content"])
+
+        self.assertTrue(is_compressed(raw_content(notification.pk)[1]))
+        notification.refresh_from_db()
+        self.assertEqual(notification.html_content, "<p>Hello World!</p>")
+
+    @override_settings(
+        HERALD_COMPRESS_CONTENT=True, HERALD_COMPRESS_CONTENT_MIN_LENGTH=10
+    )
+    def test_send(self):
+        MyNotification().send()
+
+        notification = SentNotification.objects.get()
+        self.assertTrue(all(is_compressed(x) for x in raw_content(notification.pk)))
+        self.assertIn("Hello World", notification.html_content)
+
+        # resending saves the decompressed content compressed again
+        self.assertTrue(MyNotification.resend(notification))
+        notification.refresh_from_db()
+        self.assertIn("Hello World", notification.html_content)
@@ -0,0 +1,97 @@
+import os
+import subprocess
+import sys
+
+from django.test import SimpleTestCase
+
+from herald import NotificationRegistry
+
+from .notifications import MyNotification
+
+# starts django with herald in a fresh interpreter, timing every import
+SCRIPT = """
+import django
+from django.conf import settings
+
+settings.configure(
+    INSTALLED_APPS=[
+        "django.contrib.contenttypes",
+        "django.contrib.auth",
+        "django.contrib.sites",
+        "herald",
+    ],
+    DATABASES={"default": {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"}},
+    HERALD_AUTODISCOVER=False,
+)
+django.setup()
+
+from herald import registry
+
+registry.register("tests.notifications.MyNotification")
+"""
+
+# microseconds
+IMPORT_BUDGET = 250000
+
+HEAVY_MODULES = ("jsonpickle", "html2text", "twilio", "django.contrib.admin", "tests")
+
+
+class ImportTimeTests(SimpleTestCase):
+    def get_import_times(self):
+        """
+        Returns the cumulative import time in microseconds of every module imported by SCRIPT
+        """
+
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", SCRIPT],
+            capture_output=True,
+            text=True,
+            check=True,
+            env=dict(
+                os.environ,
+                PYTHONPATH=os.pathsep.join(sys.path),
+            ),
+        )
+
+        times = {}
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+            _self, cumulative, module = line[len("import time:") :].split("|")
+            times[module.strip()] = int(cumulative)
+
+        return times
+
+    def test_startup_imports(self):
+        times = self.get_import_times()
+
+        for module in HEAVY_MODULES:
+            self.assertNotIn(module, times)
+
+        # a generous budget that still catches a heavy dependency imported at module level again
+        self.assertLess(times["herald.base"], IMPORT_BUDGET)
+
+
+class LazyRegistryTests(SimpleTestCase):
+    def test_register_path(self):
+        registry = NotificationRegistry()
+        registry.register("tests.notifications.MyNotification")
+
+        self.assertEqual(
+            registry._registry["tests.notifications.MyNotification"],
+            "tests.notifications.MyNotification",
+        )
+        self.assertIs(
+            registry.get("tests.notifications.MyNotification"), MyNotification
+        )
+        self.assertEqual(registry.get_notification_classes(), [MyNotification])
+
+        registry.unregister("tests.notifications.MyNotification")
+        self.assertEqual(registry.get_notification_classes(), [])
+
+    def test_register_invalid_path(self):
+        registry = NotificationRegistry()
+        registry.register("tests.models.SentNotificationCompany")
+
+        with self.assertRaises(ValueError):
+            registry.get("tests.models.SentNotificationCompany")
@@ -0,0 +1,57 @@
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from herald.models import SentNotification
+
+
+@skipUnless(connection.vendor == "sqlite", "query plans are checked on SQLite")
+class SentNotificationIndexTests(TestCase):
+    def assertUsesIndex(self, queryset, fields):
+        index = next(x for x in SentNotification._meta.indexes if x.fields == fields)
+        self.assertIn("USING INDEX {}".format(index.name), queryset.explain())
+
+    def test_retention_cleanup(self):
+        self.assertUsesIndex(
+            SentNotification.objects.filter(date_sent__lt=timezone.now()),
+            ["date_sent"],
+        )
+
+    def test_status(self):
+        self.assertUsesIndex(
+            SentNotification.objects.filter(
+                status=SentNotification.STATUS_FAILED, date_sent__lt=timezone.now()
+            ),
+            ["status", "date_sent"],
+        )
+
+    def test_worker_queue(self):
+        self.assertUsesIndex(
+            SentNotification.objects.filter(
+                status=SentNotification.STATUS_QUEUED
+            ).order_by("date_sent", "pk")[:100],
+            ["status", "date_sent"],
+        )
+
+    def test_notification_class(self):
+        self.assertUsesIndex(
+            SentNotification.objects.filter(
+                notification_class="tests.notifications.MyNotification"
+            ).order_by("-date_sent"),
+            ["notification_class", "date_sent"],
+        )
+
+    def test_user_history(self):
+        self.assertUsesIndex(
+            SentNotification.objects.filter(user_id=1).order_by("-date_sent"),
+            ["user", "date_sent"],
+        )
+
+    def test_user(self):
+        # e.g. setting user to null when a user is deleted
+        self.assertUsesIndex(
+            SentNotification.objects.filter(user_id=1),
+            ["user", "date_sent"],
+        )
@@ -3,6 +3,8 @@ from django.test import TestCase
 from herald import registry
 from herald.base import EmailNotification
 
+from .notifications import MyNotification
+
 
 class InitTests(TestCase):
     def test_register(self):
@@ -28,6 +30,19 @@ class InitTests(TestCase):
 
         self.assertEqual(len(registry._registry), 6)
 
+    def test_get(self):
+        self.assertIs(
+            registry.get("tests.notifications.MyNotification"), MyNotification
+        )
+        self.assertIsNone(registry.get("tests.notifications.Unknown"))
+
+    def test_unregister_unknown(self):
+        class TestNotification(EmailNotification):
+            pass
+
+        with self.assertRaises(ValueError):
+            registry.unregister(TestNotification)
+
     def test_register_invalid(self):
         class TestNotification(object):
             pass
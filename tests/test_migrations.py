@@ -1,8 +1,15 @@
 from django.core.management import call_command
-from django.test import TestCase
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
 from mock import patch
 
 
+def executor_leaf_nodes():
+    return MigrationExecutor(connection).loader.graph.leaf_nodes()
+
+
 class MigrationTests(TestCase):
     def test_no_migrations_created(self):
         with patch("sys.exit") as exit_mocked:
@@ -10,3 +17,57 @@ class MigrationTests(TestCase):
                 "makemigrations", "herald", dry_run=True, check=True, verbosity=0
             )
             exit_mocked.assert_not_called()
+
+
+class ExtraDataMigrationTests(TransactionTestCase):
+    migrate_from = [("herald", "0012_sentnotification_extra_data_json")]
+    migrate_to = [("herald", "0014_sentnotification_extra_data_jsonfield")]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(executor_leaf_nodes())
+
+    def test_copy_extra_data(self):
+        apps = self.migrate(self.migrate_from)
+        SentNotification = apps.get_model("herald", "SentNotification")
+        for extra_data in [
+            '{"reply_to": ["reply@example.com"]}',
+            "{}",
+            None,
+            "not json",
+            '["a list"]',
+        ]:
+            SentNotification.objects.create(
+                notification_class="tests.notifications.MyNotification",
+                date_sent=timezone.now(),
+                extra_data=extra_data,
+            )
+
+        apps = self.migrate(self.migrate_to)
+        SentNotification = apps.get_model("herald", "SentNotification")
+
+        self.assertEqual(
+            list(
+                SentNotification.objects.order_by("pk").values_list(
+                    "extra_data", flat=True
+                )
+            ),
+            [
+                {"reply_to": ["reply@example.com"]},
+                None,
+                None,
+                {"value": "not json"},
+                {"value": ["a list"]},
+            ],
+        )
+        self.assertEqual(
+            SentNotification.objects.filter(
+                extra_data__reply_to__0="reply@example.com"
+            ).count(),
+            1,
+        )
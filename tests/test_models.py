@@ -1,4 +1,5 @@
 from django.test import TestCase
+from django.utils import timezone
 from mock import patch
 
 from herald.models import Notification, SentNotification
@@ -29,6 +30,30 @@ class SentNotificationTests(TestCase):
             notification.get_extra_data(), {"something": ["one", "two"]}
         )
 
+    def test_get_extra_data_json(self):
+        notification = SentNotification(extra_data={"something": ["one", "two"]})
+        self.assertDictEqual(
+            notification.get_extra_data(), {"something": ["one", "two"]}
+        )
+
+    def test_extra_data_query(self):
+        SentNotification.objects.create(
+            notification_class="tests.notifications.MyNotification",
+            date_sent=timezone.now(),
+            extra_data={"reply_to": "reply@example.com"},
+        )
+        SentNotification.objects.create(
+            notification_class="tests.notifications.MyNotification",
+            date_sent=timezone.now(),
+        )
+
+        self.assertEqual(
+            SentNotification.objects.filter(
+                extra_data__reply_to="reply@example.com"
+            ).count(),
+            1,
+        )
+
     def test_resend(self):
         notification = SentNotification(
             notification_class="tests.notifications.MyNotification"
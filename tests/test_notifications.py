@@ -1,23 +1,42 @@
+import threading
+import time
 from datetime import timedelta
+from io import StringIO
 
-import jsonpickle
 from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
 from django.core.files import File
-from django.core.mail import EmailMultiAlternatives
-from django.template import TemplateDoesNotExist
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.management import call_command
+from django.template import TemplateDoesNotExist, loader
 from django.test import TestCase, override_settings
 from django.utils import timezone
 from mock import patch
 
-from herald.base import EmailNotification, NotificationBase, TwilioTextNotification
+from herald.attachments import decode_attachments
+from herald.base import (
+    EmailNotification,
+    NotificationBase,
+    TwilioSendError,
+    TwilioTextNotification,
+    _template_cache,
+    clear_template_cache,
+    get_twilio_client,
+    warm_template_cache,
+)
 from herald.models import SentNotification
+from herald.utils import queue_notifications
 
 from .notifications import (
     MyBccOnlyNotification,
     MyNotification,
     MyNotificationAttachmentOpen,
+    MyOtherNotification,
 )
 
+from twilio.http.http_client import TwilioHttpClient
+
 try:
     # twilio version 6
     from twilio.rest.api.v2010.account import MessageList
@@ -33,6 +52,24 @@ class BaseNotificationTests(TestCase):
             {"hello": "world", "base_url": "http://example.com", "subject": None},
         )
 
+    def test_context_data(self):
+        notification = MyNotification()
+
+        with patch.object(
+            MyNotification, "get_context_data", return_value={}
+        ) as mocked_get_context_data:
+            self.assertIs(notification.context_data, notification.context_data)
+            notification.preview("html")
+            notification.send()
+
+        mocked_get_context_data.assert_called_once()
+
+    def test_get_context_data_site_cached(self):
+        MyNotification().get_context_data()
+
+        with self.assertNumQueries(0):
+            MyNotification().get_context_data()
+
     def test_get_recipients(self):
         self.assertRaises(NotImplementedError, NotificationBase().get_recipients)
 
@@ -155,6 +192,43 @@ class BaseNotificationTests(TestCase):
             "<html><body>Hello World</body></html>",
         )
 
+    def test_send_many(self):
+        with patch(
+            "herald.base.get_connection", wraps=get_connection
+        ) as mocked_get_connection:
+            results = MyOtherNotification.send_many(
+                [MyOtherNotification() for _ in range(3)], batch_size=2
+            )
+
+        self.assertListEqual(results, [True, True, True])
+        self.assertEqual(len(mail.outbox), 3)
+        # one connection per batch
+        self.assertEqual(mocked_get_connection.call_count, 2)
+        self.assertEqual(
+            SentNotification.objects.filter(
+                status=SentNotification.STATUS_SUCCESS
+            ).count(),
+            3,
+        )
+
+    def test_send_many_error(self):
+        with patch.object(EmailNotification, "_send") as mocked__send:
+            mocked__send.side_effect = [None, Exception("boom")]
+            results = MyOtherNotification.send_many(
+                [MyOtherNotification(), MyOtherNotification()]
+            )
+
+        self.assertListEqual(results, [True, False])
+        failed = SentNotification.objects.get(status=SentNotification.STATUS_FAILED)
+        self.assertEqual(failed.error_message, "boom")
+        self.assertIn("connection", mocked__send.call_args[1])
+
+    def test_send_many_invalid(self):
+        with self.assertRaises(ValueError):
+            MyOtherNotification.send_many([MyNotification()])
+
+        self.assertEqual(SentNotification.objects.count(), 0)
+
     def test_resend_error(self):
         notification = SentNotification()
 
@@ -194,7 +268,10 @@ class BaseNotificationTests(TestCase):
         class TestNotification(EmailNotification):
             attachments = []
 
-        self.assertJSONEqual(TestNotification()._get_encoded_attachments(), [])
+        self.assertJSONEqual(
+            TestNotification()._get_encoded_attachments(),
+            {"encoded_attachments": 1, "attachments": []},
+        )
 
     def test_get_encoded_attachments_basic(self):
         class TestNotification(EmailNotification):
@@ -202,16 +279,28 @@ class BaseNotificationTests(TestCase):
 
         self.assertJSONEqual(
             TestNotification()._get_encoded_attachments(),
-            [{"py/tuple": ["Report.txt", "raw_data", "text/plain"]}],
+            {
+                "encoded_attachments": 1,
+                "attachments": [
+                    {
+                        "type": "file",
+                        "filename": "Report.txt",
+                        "mimetype": "text/plain",
+                        "text": "raw_data",
+                    }
+                ],
+            },
         )
 
     def test_get_encoded_attachments_file(self):
         class TestNotification(EmailNotification):
             attachments = [File(open("tests/python.jpeg", "rb"))]
 
-        attachments = jsonpickle.loads(TestNotification()._get_encoded_attachments())
+        attachments = decode_attachments(TestNotification()._get_encoded_attachments())
         self.assertEqual(attachments[0][0], "tests/python.jpeg")
         self.assertEqual(attachments[0][2], "image/jpeg")
+        with open("tests/python.jpeg", "rb") as f:
+            self.assertEqual(attachments[0][1], f.read())
 
     def test_delete_notifications_no_setting(self):
         # create a test notification from a long time ago
@@ -253,6 +342,383 @@ class BaseNotificationTests(TestCase):
         self.assertFalse(n1.id in ids)
 
 
+class TemplateCacheTests(TestCase):
+    def setUp(self):
+        clear_template_cache()
+
+    def tearDown(self):
+        clear_template_cache()
+
+    def test_cached(self):
+        with patch.object(
+            loader, "get_template", wraps=loader.get_template
+        ) as mocked_get_template:
+            self.assertEqual(MyNotification().render("text", {}), "Hello World")
+            self.assertEqual(MyOtherNotification().render("text", {}), "Hello World")
+
+        mocked_get_template.assert_called_once_with("herald/text/hello_world.txt")
+
+    @override_settings(HERALD_TEMPLATE_CACHE=False)
+    def test_disabled(self):
+        with patch.object(
+            loader, "get_template", wraps=loader.get_template
+        ) as mocked_get_template:
+            MyNotification().render("text", {})
+            MyNotification().render("text", {})
+
+        self.assertEqual(mocked_get_template.call_count, 2)
+
+    def test_missing_cached(self):
+        class DummyNotification(NotificationBase):
+            render_types = ["text"]
+            template_name = "does_not_exist"
+
+        with patch.object(
+            loader, "get_template", wraps=loader.get_template
+        ) as mocked_get_template:
+            for _ in range(2):
+                with self.assertRaises(TemplateDoesNotExist):
+                    DummyNotification().render("text", {})
+
+        mocked_get_template.assert_called_once()
+
+    def test_warm(self):
+        warm_template_cache()
+
+        self.assertIn("herald/text/hello_world.txt", _template_cache)
+        self.assertIn("herald/html/hello_world.html", _template_cache)
+
+    def test_get_template_name(self):
+        class DummyNotification(NotificationBase):
+            template_name = "custompath/hello_world"
+
+        self.assertEqual(
+            DummyNotification().get_template_name("text"),
+            "custompath/hello_world.txt",
+        )
+        self.assertEqual(
+            MyNotification().get_template_name("html"),
+            "herald/html/hello_world.html",
+        )
+
+
+@override_settings(HERALD_NOTIFICATION_RETENTION_TIME=timedelta(weeks=26))
+class RetentionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def create_expired(self):
+        return SentNotification.objects.create(
+            recipients="test@test.com",
+            date_sent=timezone.now() - timedelta(weeks=52),
+            notification_class="MyNotification",
+        )
+
+    def test_throttled(self):
+        self.create_expired()
+        MyNotification().send()
+        self.assertEqual(SentNotification.objects.count(), 1)
+
+        # a second send within the interval does not run the cleanup again
+        self.create_expired()
+        MyNotification().send()
+        self.assertEqual(SentNotification.objects.count(), 3)
+
+    @override_settings(HERALD_NOTIFICATION_RETENTION_INTERVAL=None)
+    def test_not_throttled(self):
+        self.create_expired()
+        MyNotification().send()
+        self.create_expired()
+        MyNotification().send()
+        self.assertEqual(SentNotification.objects.count(), 2)
+
+    @override_settings(HERALD_NOTIFICATION_RETENTION_BATCH_SIZE=2)
+    def test_one_batch_on_send(self):
+        for _ in range(5):
+            self.create_expired()
+
+        # the send only deletes one batch of the backlog
+        MyNotification().send()
+        self.assertEqual(SentNotification.objects.count(), 4)
+
+        call_command("heraldcleanup", stdout=StringIO())
+        self.assertEqual(SentNotification.objects.count(), 1)
+
+    @override_settings(HERALD_NOTIFICATION_RETENTION_ON_SEND=False)
+    def test_not_on_send(self):
+        self.create_expired()
+        MyNotification().send()
+        self.assertEqual(SentNotification.objects.count(), 2)
+
+
+class DeduplicatedNotification(MyOtherNotification):
+    duplicate_window = timedelta(minutes=5)
+
+
+class DuplicateSuppressionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def statuses(self):
+        return list(
+            SentNotification.objects.order_by("pk").values_list("status", flat=True)
+        )
+
+    def test_not_enabled(self):
+        self.assertTrue(MyOtherNotification().send())
+        self.assertTrue(MyOtherNotification().send())
+
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_send(self):
+        self.assertTrue(DeduplicatedNotification().send())
+        self.assertTrue(DeduplicatedNotification().send())
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(
+            self.statuses(),
+            [SentNotification.STATUS_SUCCESS, SentNotification.STATUS_SUPPRESSED],
+        )
+        suppressed = SentNotification.objects.order_by("pk").last()
+        self.assertFalse(suppressed.content_stored)
+        self.assertEqual(suppressed.recipients, "test@test.com")
+
+    def test_other_recipient(self):
+        class OtherRecipient(DeduplicatedNotification):
+            to_emails = ["other@test.com"]
+
+        DeduplicatedNotification().send()
+        OtherRecipient().send()
+
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_window_expired(self):
+        DeduplicatedNotification().send()
+        # the key expires with the window
+        cache.delete(
+            DeduplicatedNotification.get_duplicate_key(SentNotification.objects.get())
+        )
+        DeduplicatedNotification().send()
+
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_failed_send_is_not_suppressed(self):
+        with patch.object(
+            DeduplicatedNotification, "_send", side_effect=Exception("outage")
+        ):
+            self.assertFalse(DeduplicatedNotification().send())
+
+        self.assertTrue(DeduplicatedNotification().send())
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(
+            self.statuses(),
+            [SentNotification.STATUS_FAILED, SentNotification.STATUS_SUCCESS],
+        )
+
+    def test_other_extra_data(self):
+        DeduplicatedNotification().send()
+
+        notification = DeduplicatedNotification()
+        notification.bcc = ["audit@test.com"]
+        notification.send()
+
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_other_attachments(self):
+        DeduplicatedNotification().send()
+
+        notification = DeduplicatedNotification()
+        notification.attachments = [("Report.txt", "Some Report Data", "text/plain")]
+        notification.send()
+
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_deferred_failed_send_is_not_suppressed(self):
+        DeduplicatedNotification().send(deferred=True)
+
+        with patch.object(
+            DeduplicatedNotification, "_send", side_effect=Exception("outage")
+        ):
+            DeduplicatedNotification.resend_many(list(SentNotification.objects.all()))
+
+        self.assertTrue(DeduplicatedNotification().send())
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(
+            self.statuses(),
+            [SentNotification.STATUS_FAILED, SentNotification.STATUS_SUCCESS],
+        )
+
+    def test_deferred(self):
+        DeduplicatedNotification().send(deferred=True)
+        DeduplicatedNotification().send(deferred=True)
+
+        self.assertEqual(
+            self.statuses(),
+            [SentNotification.STATUS_QUEUED, SentNotification.STATUS_SUPPRESSED],
+        )
+
+    def test_send_many(self):
+        DeduplicatedNotification().send()
+
+        results = DeduplicatedNotification.send_many(
+            [DeduplicatedNotification(), DeduplicatedNotification()]
+        )
+
+        self.assertEqual(results, [True, True])
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(
+            self.statuses(),
+            [SentNotification.STATUS_SUCCESS]
+            + [SentNotification.STATUS_SUPPRESSED] * 2,
+        )
+
+    def test_send_many_mixed(self):
+        notifications = [DeduplicatedNotification() for _ in range(3)]
+        notifications[2].to_emails = ["other@test.com"]
+
+        results = DeduplicatedNotification.send_many(notifications)
+
+        self.assertEqual(results, [True, True, True])
+        self.assertEqual(
+            self.statuses(),
+            [
+                SentNotification.STATUS_SUCCESS,
+                SentNotification.STATUS_SUPPRESSED,
+                SentNotification.STATUS_SUCCESS,
+            ],
+        )
+
+
+class ContentPolicyTests(TestCase):
+    def assertContentStored(self, sent_notification, stored):
+        self.assertEqual(sent_notification.content_stored, stored)
+        self.assertEqual(sent_notification.text_content is not None, stored)
+        self.assertEqual(sent_notification.attachments is not None, stored)
+
+    @override_settings(HERALD_CONTENT_POLICY="metadata")
+    def test_metadata(self):
+        self.assertTrue(MyNotification().send())
+
+        sent_notification = SentNotification.objects.get()
+        self.assertContentStored(sent_notification, False)
+        self.assertEqual(sent_notification.recipients, "test@test.com")
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn("Hello World", mail.outbox[0].body)
+        self.assertEqual(len(mail.outbox[0].attachments), 2)
+
+    @override_settings(HERALD_CONTENT_POLICY="metadata")
+    def test_class_policy(self):
+        with patch.object(MyNotification, "content_policy", "all"):
+            MyNotification().send()
+
+        self.assertContentStored(SentNotification.objects.get(), True)
+
+    @override_settings(HERALD_CONTENT_POLICY="failed")
+    def test_failed(self):
+        MyNotification().send()
+
+        with patch.object(MyNotification, "_send", side_effect=Exception("error")):
+            MyNotification().send()
+
+        sent, failed = SentNotification.objects.order_by("pk")
+        self.assertContentStored(sent, False)
+        self.assertContentStored(failed, True)
+        self.assertEqual(failed.status, SentNotification.STATUS_FAILED)
+
+    @override_settings(HERALD_CONTENT_POLICY=0.5)
+    def test_sampled(self):
+        with patch("herald.base.random.random", side_effect=[0.2, 0.7]):
+            MyNotification().send()
+            MyNotification().send()
+
+        kept, dropped = SentNotification.objects.order_by("pk")
+        self.assertContentStored(kept, True)
+        self.assertContentStored(dropped, False)
+
+    def test_invalid(self):
+        for policy in ("foo", 2, True):
+            with override_settings(HERALD_CONTENT_POLICY=policy):
+                self.assertRaises(
+                    ImproperlyConfigured, MyNotification.get_content_policy
+                )
+
+    @override_settings(HERALD_CONTENT_POLICY="failed")
+    def test_send_many(self):
+        notifications = [MyOtherNotification() for _ in range(3)]
+
+        with patch.object(
+            MyOtherNotification,
+            "_send",
+            side_effect=[None, Exception("error"), None],
+        ):
+            MyOtherNotification.send_many(notifications)
+
+        sent_notifications = list(SentNotification.objects.order_by("pk"))
+        self.assertEqual(
+            [x.content_stored for x in sent_notifications], [False, True, False]
+        )
+        self.assertIn("Hello World", sent_notifications[1].text_content)
+        self.assertIsNone(sent_notifications[0].text_content)
+
+    @override_settings(HERALD_CONTENT_POLICY="metadata")
+    def test_deferred(self):
+        MyOtherNotification().send(deferred=True)
+
+        # queued notifications keep their content until they are sent
+        self.assertContentStored(SentNotification.objects.get(), True)
+
+        call_command("heraldworker", once=True, verbosity=0)
+
+        self.assertContentStored(SentNotification.objects.get(), False)
+        self.assertIn("Hello World", mail.outbox[0].body)
+
+    @override_settings(HERALD_CONTENT_POLICY="metadata")
+    def test_resend_missing_content(self):
+        MyOtherNotification().send()
+        sent_notification = SentNotification.objects.get()
+
+        date_sent = sent_notification.date_sent
+
+        # the history of the delivered notification is kept
+        self.assertFalse(MyOtherNotification.resend(sent_notification))
+        self.assertEqual(MyOtherNotification.resend_many([sent_notification]), [False])
+        sent_notification.refresh_from_db()
+        self.assertEqual(sent_notification.status, SentNotification.STATUS_SUCCESS)
+        self.assertEqual(sent_notification.date_sent, date_sent)
+        self.assertIsNone(sent_notification.error_message)
+        self.assertEqual(len(mail.outbox), 1)
+
+        # and it is not queued, since the worker could not send it either
+        self.assertEqual(queue_notifications(SentNotification.objects.all()), 0)
+
+    @override_settings(HERALD_CONTENT_POLICY="metadata")
+    def test_resend_rendered_again(self):
+        MyOtherNotification().send()
+        sent_notification = SentNotification.objects.get()
+
+        with patch.object(
+            MyOtherNotification,
+            "from_sent_notification",
+            side_effect=lambda x: MyOtherNotification(),
+        ):
+            self.assertTrue(MyOtherNotification.resend(sent_notification))
+            self.assertEqual(
+                MyOtherNotification.resend_many([sent_notification]), [True]
+            )
+
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertIn("Hello World", mail.outbox[2].body)
+        self.assertContentStored(SentNotification.objects.get(), False)
+
+
 class EmailNotificationTests(TestCase):
     def test_get_recipients(self):
         self.assertListEqual(MyNotification().get_recipients(), ["test@test.com"])
@@ -296,6 +762,35 @@ class EmailNotificationTests(TestCase):
             },
         )
 
+    def test_send_override_without_connection(self):
+        class TestNotification(EmailNotification):
+            template_name = "hello_world"
+            to_emails = ["test@test.com"]
+
+            @staticmethod
+            def _send(
+                recipients,
+                text_content=None,
+                html_content=None,
+                sent_from=None,
+                subject=None,
+                extra_data=None,
+                attachments=None,
+            ):
+                mail.outbox.append(recipients)
+
+        self.assertTrue(TestNotification().send(raise_exception=True))
+        self.assertListEqual(
+            TestNotification.send_many([TestNotification(), TestNotification()]),
+            [True, True],
+        )
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertFalse(
+            SentNotification.objects.exclude(
+                status=SentNotification.STATUS_SUCCESS
+            ).exists()
+        )
+
     def test_bcc_only_notification(self):
         class TestBccOnlyNotification(MyBccOnlyNotification):
             pass
@@ -325,6 +820,29 @@ class EmailNotificationTests(TestCase):
             output = TestNotificationHTML2Text().render(render_type="text", context={})
             self.assertEqual(output, "# Hello World\n\n")
 
+    @override_settings(HERALD_HTML2TEXT_ENABLED=True, HERALD_HTML2TEXT_CACHE_SIZE=1)
+    def test_render_html2text_cached(self):
+        class TestNotificationHTML2Text(EmailNotification):
+            template_name = "hello_world_html2text"
+
+        with patch.object(
+            TestNotificationHTML2Text,
+            "get_html2text_converter",
+            wraps=TestNotificationHTML2Text.get_html2text_converter,
+        ) as mocked_get_html2text_converter:
+            for _ in range(2):
+                output = TestNotificationHTML2Text().render(
+                    render_type="text", context={}
+                )
+                self.assertEqual(output, "# Hello World\n\n")
+
+            # evicts the first conversion
+            TestNotificationHTML2Text().html_to_text("<p>Other</p>")
+            TestNotificationHTML2Text().render(render_type="text", context={})
+
+        # the second render was served from the cache
+        self.assertEqual(mocked_get_html2text_converter.call_count, 3)
+
     def test_send_html_content(self):
         class TestNotification(EmailNotification):
             subject = "test subject"
@@ -342,6 +860,32 @@ class EmailNotificationTests(TestCase):
             mocked_attach_alternative.assert_called_once_with("Text", "text/html")
 
 
+class StubTwilioClient:
+    """
+    Records the messages created from any thread instead of calling the Twilio API
+    """
+
+    def __init__(self, delay=0, failing=()):
+        self.delay = delay
+        self.failing = failing
+        self.sent = []
+        self.threads = set()
+        self.lock = threading.Lock()
+        self.messages = self
+
+    def create(self, body, to, from_):
+        time.sleep(self.delay)
+
+        with self.lock:
+            self.threads.add(threading.get_ident())
+
+        if to in self.failing:
+            raise Exception("invalid number")
+
+        with self.lock:
+            self.sent.append(to)
+
+
 class TwilioNotificationTests(TestCase):
     def test_get_recipients(self):
         class TestNotification(TwilioTextNotification):
@@ -403,6 +947,121 @@ class TwilioNotificationTests(TestCase):
                     body="Hello World", to=recipient, from_=notification.get_sent_from()
                 )
 
+    @override_settings(TWILIO_ACCOUNT_SID="sid", TWILIO_AUTH_TOKEN="token")
+    def test_client_cached(self):
+        client = get_twilio_client()
+        self.assertIs(get_twilio_client(), client)
+        self.assertIsInstance(client.http_client, TwilioHttpClient)
+        self.assertIsNotNone(client.http_client.session)
+
+        with override_settings(TWILIO_AUTH_TOKEN="other"):
+            other_client = get_twilio_client()
+            self.assertIsNot(other_client, client)
+            self.assertEqual(other_client.password, "other")
+
+        self.assertEqual(get_twilio_client().password, "token")
+
+        with override_settings(HERALD_TWILIO_CONCURRENCY=20):
+            adapter = get_twilio_client().http_client.session.get_adapter(
+                "https://api.twilio.com"
+            )
+            self.assertEqual(adapter._pool_maxsize, 20)
+
+    @override_settings(TWILIO_ACCOUNT_SID="sid", TWILIO_AUTH_TOKEN="token")
+    def test_send_reuses_client(self):
+        class TestNotification(TwilioTextNotification):
+            from_number = "1231231234"
+            to_number = "1231231234"
+            template_name = "hello_world"
+
+        with patch("twilio.rest.Client") as mocked_client:
+            TestNotification().send()
+            TestNotification().send()
+
+        mocked_client.assert_called_once()
+        self.assertEqual(mocked_client.return_value.messages.create.call_count, 2)
+
+    @override_settings(HERALD_TWILIO_CONCURRENCY=5)
+    def test_send_concurrent(self):
+        client = StubTwilioClient(delay=0.05, failing=["5"])
+        recipients = [str(x) for x in range(10)]
+
+        class TestNotification(TwilioTextNotification):
+            from_number = "1231231234"
+            template_name = "hello_world"
+
+            def get_recipients(self):
+                return recipients
+
+        with patch("herald.base.get_twilio_client", return_value=client):
+            self.assertFalse(TestNotification().send())
+
+        # the failure did not keep the other recipients from getting the message
+        self.assertCountEqual(client.sent, [x for x in recipients if x != "5"])
+        self.assertGreater(len(client.threads), 1)
+
+        sent_notification = SentNotification.objects.get()
+        self.assertEqual(sent_notification.status, SentNotification.STATUS_FAILED)
+        self.assertEqual(
+            sent_notification.error_message,
+            "Failed to send to 1 of 10 recipient(s): 5: invalid number",
+        )
+
+        with patch("herald.base.get_twilio_client", return_value=client):
+            with self.assertRaises(TwilioSendError) as cm:
+                TestNotification().send(raise_exception=True)
+        self.assertEqual(list(cm.exception.failures), ["5"])
+
+    @override_settings(HERALD_TWILIO_CONCURRENCY=4, HERALD_TWILIO_RATE_LIMIT=50)
+    def test_send_rate_limited(self):
+        client = StubTwilioClient()
+
+        class TestNotification(TwilioTextNotification):
+            from_number = "1231231234"
+            template_name = "hello_world"
+
+            def get_recipients(self):
+                return [str(x) for x in range(6)]
+
+        with (
+            patch("herald.base.get_twilio_client", return_value=client),
+            patch("herald.utils.TokenBucket.acquire") as mocked_acquire,
+        ):
+            self.assertTrue(TestNotification().send())
+
+        self.assertEqual(mocked_acquire.call_count, 6)
+        self.assertEqual(len(client.sent), 6)
+
+    @override_settings(HERALD_TWILIO_CONCURRENCY=1, HERALD_TWILIO_RATE_LIMIT=2)
+    def test_send_rate_limit_waits(self):
+        client = StubTwilioClient()
+        now = [100.0]
+        sleeps = []
+
+        def sleep(seconds):
+            # the time module is shared, so only the waits of the rate limiter are recorded
+            if seconds:
+                sleeps.append(seconds)
+            now[0] += seconds
+
+        class TestNotification(TwilioTextNotification):
+            from_number = "1231231234"
+            template_name = "hello_world"
+
+            def get_recipients(self):
+                return [str(x) for x in range(6)]
+
+        with (
+            patch("herald.base.get_twilio_client", return_value=client),
+            patch("herald.utils.time.monotonic", side_effect=lambda: now[0]),
+            patch("herald.utils.time.sleep", side_effect=sleep),
+        ):
+            self.assertTrue(TestNotification().send())
+
+        # a burst of 2 messages, then 2 messages per second
+        self.assertEqual(sleeps, [0.5] * 4)
+        self.assertEqual(len(client.sent), 6)
+
     def test_send_no_settings(self):
         class TestNotification(TwilioTextNotification):
             from_number = "1231231234"
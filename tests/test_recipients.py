@@ -0,0 +1,152 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from herald.base import EmailNotification
+from herald.models import Recipient, SentNotification
+from herald.recipients import link_recipients, normalize_recipient
+
+from .notifications import MyOtherNotification
+
+
+class ManyRecipientsNotification(EmailNotification):
+    template_name = "hello_world"
+    to_emails = ["user{}@example.com".format(i) for i in range(200)]
+
+
+class RecipientTests(TestCase):
+    def test_normalize(self):
+        self.assertEqual(
+            normalize_recipient(" Alice@Example.com "), "alice@example.com"
+        )
+        self.assertEqual(
+            normalize_recipient("Alice <Alice@Example.com>"), "alice@example.com"
+        )
+        self.assertEqual(normalize_recipient("+15551234567"), "+15551234567")
+
+    def test_send(self):
+        class TestNotification(EmailNotification):
+            template_name = "hello_world"
+            to_emails = ["Alice@Example.com", "Bob <bob@example.com>"]
+
+        TestNotification().send(raise_exception=True)
+
+        sent_notification = SentNotification.objects.get()
+        self.assertEqual(
+            set(
+                sent_notification.recipient_addresses.values_list("address", flat=True)
+            ),
+            {"alice@example.com", "bob@example.com"},
+        )
+        self.assertEqual(
+            list(SentNotification.objects.sent_to("ALICE@example.com")),
+            [sent_notification],
+        )
+
+    def test_send_many(self):
+        MyOtherNotification.send_many([MyOtherNotification() for _ in range(3)])
+
+        # the recipient is shared by every notification sent to it
+        self.assertEqual(Recipient.objects.count(), 1)
+        self.assertEqual(SentNotification.objects.sent_to("test@test.com").count(), 3)
+
+    def test_deferred(self):
+        MyOtherNotification().send(deferred=True)
+
+        self.assertEqual(SentNotification.objects.sent_to("test@test.com").count(), 1)
+
+    def test_sent_to_many(self):
+        class TestNotification(EmailNotification):
+            template_name = "hello_world"
+            to_emails = ["alice@example.com", "bob@example.com"]
+
+        TestNotification().send(raise_exception=True)
+        MyOtherNotification().send(raise_exception=True)
+
+        self.assertEqual(
+            SentNotification.objects.sent_to(
+                "alice@example.com", "bob@example.com"
+            ).count(),
+            1,
+        )
+        self.assertEqual(
+            SentNotification.objects.sent_to("nobody@example.com").count(), 0
+        )
+
+    def test_long_recipients(self):
+        ManyRecipientsNotification().send(raise_exception=True)
+
+        sent_notification = SentNotification.objects.get()
+        self.assertGreater(len(sent_notification.recipients), 2000)
+        self.assertEqual(len(sent_notification.get_recipients()), 200)
+        self.assertEqual(sent_notification.recipient_addresses.count(), 200)
+
+    @override_settings(HERALD_INDEX_RECIPIENTS=False)
+    def test_disabled(self):
+        MyOtherNotification().send(raise_exception=True)
+
+        self.assertEqual(Recipient.objects.count(), 0)
+
+    def test_link_twice(self):
+        MyOtherNotification().send(raise_exception=True)
+
+        link_recipients(SentNotification.objects.all())
+
+        self.assertEqual(
+            SentNotification.recipient_addresses.through.objects.count(), 1
+        )
+
+
+class IndexRecipientsCommandTests(TestCase):
+    def test_backfill(self):
+        for _ in range(3):
+            SentNotification.objects.create(
+                recipients="test@test.com,other@test.com",
+                notification_class="tests.notifications.MyNotification",
+                date_sent=timezone.now(),
+            )
+        out = StringIO()
+
+        call_command("heraldindexrecipients", batch_size=2, stdout=out)
+
+        self.assertIn(
+            "Successfully indexed the recipients of 3 notification(s)", out.getvalue()
+        )
+        self.assertEqual(SentNotification.objects.sent_to("other@test.com").count(), 3)
+
+    @override_settings(HERALD_INDEX_RECIPIENTS=False)
+    def test_disabled(self):
+        with self.assertRaises(CommandError):
+            call_command("heraldindexrecipients", stdout=StringIO())
+
+
+class RecipientAdminFilterTests(TestCase):
+    def setUp(self):
+        get_user_model().objects.create_superuser(
+            "admin", "admin@example.com", "password"
+        )
+        self.client = Client()
+        self.client.login(username="admin", password="password")
+
+    def test_filter(self):
+        class TestNotification(EmailNotification):
+            template_name = "hello_world"
+            to_emails = ["found@example.com"]
+
+        TestNotification().send(raise_exception=True)
+        MyOtherNotification().send(raise_exception=True)
+
+        response = self.client.get(
+            reverse("admin:herald_sentnotification_changelist"),
+            {"recipient": "Found@Example.com", "status": "1"},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "found@example.com")
+        self.assertNotContains(response, "test@test.com")
+        # the other filters are kept when the recipient is changed
+        self.assertContains(response, '<input type="hidden" name="status" value="1">')
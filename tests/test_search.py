@@ -0,0 +1,184 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from herald.search import (
+    PostgresSearchBackend,
+    PostgresTrigramSearchBackend,
+    SQLiteSearchBackend,
+    get_search_backend,
+)
+from herald.utils import get_sent_notification_model
+
+SentNotification = get_sent_notification_model()
+NOTIFICATION_CLASS = "tests.notifications.MyNotification"
+SQLITE_BACKEND = "herald.search.SQLiteSearchBackend"
+
+
+def create_notification(**kwargs):
+    return SentNotification.objects.create(
+        notification_class=NOTIFICATION_CLASS, date_sent=timezone.now(), **kwargs
+    )
+
+
+class SQLiteSearchBackendTests(TransactionTestCase):
+    # the fts5 table is not rolled back reliably with the transaction of a TestCase
+
+    def setUp(self):
+        self.backend = SQLiteSearchBackend()
+        self.existing = create_notification(
+            recipients="existing@example.com", subject="Before the index"
+        )
+        self.backend.create_index(SentNotification, connection)
+        self.addCleanup(self.backend.drop_index, SentNotification, connection)
+
+    def search(self, term):
+        return set(self.backend.search(SentNotification.objects.all(), term))
+
+    def test_existing_rows(self):
+        self.assertEqual(self.search("before"), {self.existing})
+
+    def test_insert(self):
+        notification = create_notification(
+            recipients="test@example.com", text_content="Your invoice is ready"
+        )
+        self.assertEqual(self.search("invoice"), {notification})
+
+    def test_bulk_create(self):
+        SentNotification.objects.bulk_create(
+            [
+                SentNotification(
+                    notification_class=NOTIFICATION_CLASS,
+                    date_sent=timezone.now(),
+                    subject="Bulk {}".format(i),
+                )
+                for i in range(3)
+            ]
+        )
+        self.assertEqual(len(self.search("bulk")), 3)
+
+    def test_update(self):
+        self.existing.subject = "Changed"
+        self.existing.save()
+
+        self.assertEqual(self.search("before"), set())
+        self.assertEqual(self.search("changed"), {self.existing})
+
+    def test_queryset_update(self):
+        SentNotification.objects.filter(pk=self.existing.pk).update(sent_from="sender")
+
+        self.assertEqual(self.search("sender"), {self.existing})
+
+    def test_delete(self):
+        self.existing.delete()
+        self.assertEqual(self.search("before"), set())
+
+    def test_all_words(self):
+        create_notification(subject="Before the rest")
+
+        self.assertEqual(self.search("before index"), {self.existing})
+
+    def test_prefix(self):
+        self.assertEqual(self.search("exist"), {self.existing})
+
+    def test_operators_are_searched_literally(self):
+        self.assertEqual(self.search('"before" OR NOT*'), set())
+        self.assertEqual(self.search("before AND"), set())
+
+    def test_drop_index(self):
+        self.backend.drop_index(SentNotification, connection)
+
+        # saving still works without the triggers
+        create_notification(subject="After the index")
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE name LIKE %s",
+                ["{}_fts%".format(SentNotification._meta.db_table)],
+            )
+            self.assertEqual(cursor.fetchall(), [])
+
+
+class PostgresSearchBackendTests(TestCase):
+    def test_search(self):
+        qs = PostgresSearchBackend().search(SentNotification.objects.all(), "hello")
+        sql, params = qs.query.sql_with_params()
+
+        self.assertIn("to_tsvector('simple'::regconfig, coalesce(", sql)
+        self.assertIn("plainto_tsquery('simple'::regconfig, %s)", sql)
+        self.assertEqual(params, ("hello",))
+
+    def test_trigram_search(self):
+        qs = PostgresTrigramSearchBackend().search(
+            SentNotification.objects.all(), "hel%lo world"
+        )
+        sql, params = qs.query.sql_with_params()
+
+        self.assertEqual(sql.count("ILIKE"), 10)
+        self.assertEqual(params, ("%hel\\%lo%",) * 5 + ("%world%",) * 5)
+
+
+@override_settings(HERALD_SEARCH_BACKEND=SQLITE_BACKEND)
+class AdminSearchTests(TransactionTestCase):
+    def setUp(self):
+        get_user_model().objects.create_superuser(
+            "admin", "admin@example.com", "password"
+        )
+        self.client = Client()
+        self.client.login(username="admin", password="password")
+        get_search_backend().create_index(SentNotification, connection)
+        self.addCleanup(get_search_backend().drop_index, SentNotification, connection)
+
+    def test_search(self):
+        create_notification(recipients="found@example.com")
+        create_notification(recipients="other@example.com")
+
+        response = self.client.get(
+            reverse("admin:herald_sentnotification_changelist"), {"q": "found"}
+        )
+
+        self.assertContains(response, "found@example.com")
+        self.assertNotContains(response, "other@example.com")
+
+    def test_empty_search(self):
+        create_notification(recipients="found@example.com")
+
+        response = self.client.get(
+            reverse("admin:herald_sentnotification_changelist"), {"q": " "}
+        )
+
+        self.assertContains(response, "found@example.com")
+
+
+class SearchIndexCommandTests(TransactionTestCase):
+    def test_not_set(self):
+        with self.assertRaises(CommandError):
+            call_command("heraldsearchindex")
+
+    @override_settings(HERALD_SEARCH_BACKEND="herald.search.PostgresSearchBackend")
+    def test_wrong_vendor(self):
+        with self.assertRaises(CommandError):
+            call_command("heraldsearchindex")
+
+    @override_settings(HERALD_SEARCH_BACKEND=SQLITE_BACKEND)
+    def test_create_and_drop(self):
+        out = StringIO()
+        call_command("heraldsearchindex", stdout=out)
+        self.assertIn("Successfully created the search index", out.getvalue())
+
+        notification = create_notification(subject="Indexed")
+        self.assertEqual(
+            list(
+                get_search_backend().search(SentNotification.objects.all(), "indexed")
+            ),
+            [notification],
+        )
+
+        out = StringIO()
+        call_command("heraldsearchindex", drop=True, stdout=out)
+        self.assertIn("Successfully dropped the search index", out.getvalue())
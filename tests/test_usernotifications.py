@@ -1,13 +1,20 @@
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 
 from herald.models import Notification, SentNotification, UserNotification
+from herald.utils import (
+    get_disabled_notifications,
+    get_disabled_notifications_for_users,
+    get_disabled_notifications_timeout,
+)
 
 from .notifications import MyNotification, MyOtherNotification
 
 
 class UserNotificationTests(TestCase):
     def setUp(self):
+        cache.clear()
         User = get_user_model()
 
         # create a user who does not want to get MyOtherNotification
@@ -43,9 +50,106 @@ class UserNotificationTests(TestCase):
         sent_notification = SentNotification.objects.all()[0]
         self.assertEqual(sent_notification.status, sent_notification.STATUS_SUCCESS)
 
+    def test_send_many_disabled(self):
+        enabled = MyOtherNotification()
+        disabled = MyOtherNotification()
+        disabled.user = self.user
+
+        results = MyOtherNotification.send_many([enabled, disabled])
+        self.assertListEqual(results, [True, True])
+
+        self.assertEqual(
+            SentNotification.objects.get(user=self.user).status,
+            SentNotification.STATUS_USER_DISABLED,
+        )
+        self.assertEqual(
+            SentNotification.objects.get(user=None).status,
+            SentNotification.STATUS_SUCCESS,
+        )
+
+    def test_disabled_cached(self):
+        path = MyOtherNotification.get_class_path()
+
+        with self.assertNumQueries(1):
+            self.assertIn(path, get_disabled_notifications(self.user.pk))
+            self.assertIn(path, get_disabled_notifications(self.user.pk))
+
+    def test_disabled_invalidated(self):
+        notification = Notification.objects.get(
+            notification_class=MyOtherNotification.get_class_path()
+        )
+        self.assertTrue(get_disabled_notifications(self.user.pk))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.usernotification.disabled_notifications.remove(notification)
+        self.assertFalse(get_disabled_notifications(self.user.pk))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            notification.usernotification_set.add(self.user.usernotification)
+        self.assertTrue(get_disabled_notifications(self.user.pk))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            notification.usernotification_set.clear()
+        self.assertFalse(get_disabled_notifications(self.user.pk))
+
+    def test_disabled_invalidated_on_delete(self):
+        self.assertTrue(get_disabled_notifications(self.user.pk))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            UserNotification.objects.filter(pk=self.user.pk).delete()
+        self.assertFalse(get_disabled_notifications(self.user.pk))
+
+    def test_disabled_invalidated_on_notification_delete(self):
+        self.assertTrue(get_disabled_notifications(self.user.pk))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.filter(
+                notification_class=MyOtherNotification.get_class_path()
+            ).delete()
+        self.assertFalse(get_disabled_notifications(self.user.pk))
+
+    def test_disabled_invalidated_after_commit(self):
+        notification = Notification.objects.get(
+            notification_class=MyOtherNotification.get_class_path()
+        )
+        self.assertTrue(get_disabled_notifications(self.user.pk))
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.user.usernotification.disabled_notifications.remove(notification)
+            # a send before the commit still sees the cached preferences
+            self.assertTrue(get_disabled_notifications(self.user.pk))
+
+        for callback in callbacks:
+            callback()
+        self.assertFalse(get_disabled_notifications(self.user.pk))
+
+    def test_cache_timeout(self):
+        # the test settings use a per process cache
+        self.assertEqual(get_disabled_notifications_timeout(), 60)
+
+        with override_settings(HERALD_USER_NOTIFICATION_CACHE_TIMEOUT=600):
+            self.assertEqual(get_disabled_notifications_timeout(), 600)
+
+    def test_disabled_for_users(self):
+        other = get_user_model().objects.create(username="other")
+
+        with self.assertNumQueries(1):
+            disabled = get_disabled_notifications_for_users(
+                [self.user.pk, other.pk, None]
+            )
+
+        self.assertDictEqual(
+            disabled,
+            {
+                self.user.pk: frozenset([MyOtherNotification.get_class_path()]),
+                other.pk: frozenset(),
+            },
+        )
+
 
 class UserNotificationTestsNoSetting(TestCase):
     def setUp(self):
+        cache.clear()
         User = get_user_model()
 
         # create a user who does not want to get MyOtherNotification
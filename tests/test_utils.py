@@ -1,8 +1,18 @@
 from django.test import TestCase, override_settings
 from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from mock import patch
 
-from herald.utils import get_sent_notification_model
+from herald.models import SentNotification
+from herald.base import EmailNotification
+from herald.utils import (
+    TokenBucket,
+    delete_in_batches,
+    get_notification_class,
+    get_sent_notification_model,
+)
 from tests.models import SentNotificationCompany
+from tests.notifications import MyNotification
 
 
 class UtilsTests(TestCase):
@@ -25,3 +35,90 @@ class UtilsTests(TestCase):
             "SENT_NOTIFICATION_MODEL must be of the form 'app_label.model_name'",
         ):
             get_sent_notification_model()
+
+    def test_delete_in_batches(self):
+        for _ in range(5):
+            SentNotification.objects.create(
+                notification_class="tests.notifications.MyNotification",
+                date_sent=timezone.now(),
+            )
+
+        progress = []
+        deleted = delete_in_batches(
+            SentNotification.objects.all(), batch_size=2, progress=progress.append
+        )
+
+        self.assertEqual(deleted, 5)
+        self.assertListEqual(progress, [2, 4, 5])
+        self.assertEqual(SentNotification.objects.count(), 0)
+
+    def test_token_bucket(self):
+        now = [100.0]
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            now[0] += seconds
+
+        with (
+            patch("herald.utils.time.monotonic", side_effect=lambda: now[0]),
+            patch("herald.utils.time.sleep", side_effect=sleep),
+        ):
+            bucket = TokenBucket(2)
+            for _ in range(4):
+                bucket.acquire()
+
+        # a burst of 2, then one token every half second
+        self.assertEqual(sleeps, [0.5, 0.5])
+
+    def test_token_bucket_refill(self):
+        now = [100.0]
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            now[0] += seconds
+
+        with (
+            patch("herald.utils.time.monotonic", side_effect=lambda: now[0]),
+            patch("herald.utils.time.sleep", side_effect=sleep),
+        ):
+            bucket = TokenBucket(2, capacity=4)
+            for _ in range(4):
+                bucket.acquire()
+            self.assertEqual(sleeps, [])
+
+            # the burst is spent, so the next token takes half a second
+            bucket.acquire()
+            self.assertEqual(sleeps, [0.5])
+
+            # a second refills rate tokens
+            now[0] += 1
+            for _ in range(2):
+                bucket.acquire()
+            self.assertEqual(sleeps, [0.5])
+            bucket.acquire()
+            self.assertEqual(sleeps, [0.5, 0.5])
+
+            # an idle bucket refills up to its capacity only
+            now[0] += 100
+            for _ in range(5):
+                bucket.acquire()
+            self.assertEqual(sleeps, [0.5, 0.5, 0.5])
+
+    def test_get_notification_class(self):
+        self.assertIs(
+            get_notification_class("tests.notifications.MyNotification"),
+            MyNotification,
+        )
+
+        # classes that are not registered are imported once
+        with patch(
+            "herald.utils.import_string", return_value=EmailNotification
+        ) as mocked_import:
+            for _ in range(2):
+                self.assertIs(
+                    get_notification_class("tests.test_utils.Unregistered"),
+                    EmailNotification,
+                )
+        mocked_import.assert_called_once_with("tests.test_utils.Unregistered")
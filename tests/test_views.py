@@ -6,15 +6,23 @@ class ViewsTests(TestCase):
         client = Client()
         response = client.get("/herald/")
         self.assertContains(response, "MyNotification")
+        self.assertContains(
+            response, 'href="/herald/tests.notifications.MyNotification/html/"'
+        )
 
     def test_preview_text(self):
         client = Client()
-        response = client.get("/herald/0/text/")
+        response = client.get("/herald/tests.notifications.MyNotification/text/")
         self.assertContains(response, "Hello World")
         self.assertEqual(response["content-type"], "text/plain; charset=utf-8")
 
     def test_preview_html(self):
         client = Client()
-        response = client.get("/herald/0/html/")
+        response = client.get("/herald/tests.notifications.MyNotification/html/")
         self.assertContains(response, "<html><body>Hello World</body></html>")
         self.assertEqual(response["content-type"], "text/html; charset=utf-8")
+
+    def test_preview_unknown(self):
+        client = Client()
+        response = client.get("/herald/tests.notifications.Unknown/text/")
+        self.assertEqual(response.status_code, 404)